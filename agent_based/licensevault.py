@@ -21,14 +21,21 @@
 
 import json
 import datetime
+import time
 
-from typing import Any
+from collections import Counter, defaultdict
+from typing import Any, MutableMapping
 from cmk.agent_based.v2 import (
     AgentSection,
     check_levels,
     CheckPlugin,
     CheckResult,
     DiscoveryResult,
+    get_average,
+    get_rate,
+    get_value_store,
+    GetRateError,
+    render,
     Result,
     Service,
     State,
@@ -38,20 +45,98 @@ from cmk.agent_based.v2 import (
 
 
 JSONSection = dict[str, Any] | None
+DenialSection = dict[str, Any] | None
+
+# metric prefix, section key prefix, label
+POOLS = (
+    ('regular', 'regular', 'Regular'),
+    ('virtual', 'virtual', 'Virtual'),
+    ('trueup', 'trueUp', 'TrueUp'),
+)
+
+# Column order of the compact usage section (version 2), must match lib/agent.py
+COMPACT_COLUMNS = ('code', 'displayName', 'regularInUse', 'regularTotal', 'trueUpInUse', 'trueUpTotal', 'virtualInUse', 'virtualTotal')
+
+SATURATION_BUCKETS = 24
+FORECAST_SAMPLES = 64
+BILLING_MONTHS = {'month': 1, 'quarter': 3, 'year': 12}
+
+
+def _denial_fingerprint(denial: dict) -> str:
+    # All fields, the same id as the agent uses for keyset paging and forwarding
+    return json.dumps(denial, sort_keys=True)
+
+
+def _denial_log(denial_records: list[dict]) -> list[tuple[float, str]]:
+    return [
+        (datetime.datetime.fromisoformat(d['timestamp']).timestamp(), _denial_fingerprint(d))
+        for d in denial_records
+    ]
+
+
+def _parse_denials(denials: list[dict], truncated: bool, timestamp: float | None = None) -> dict[str, Any]:
+    denial_cutoff = datetime.datetime.now(datetime.UTC) - datetime.timedelta(days=1)
+    # Walk the denials once so parsing stays linear in products + denials. The
+    # records are only grouped, the denial rate builds its log when enabled.
+    counts = Counter()
+    denial_records = defaultdict(list)
+    for d in denials:
+        if datetime.datetime.fromisoformat(d['timestamp']) > denial_cutoff:
+            counts[d['product_name']] += 1
+        denial_records[d['product_name']].append(d)
+    return {
+        'truncated': truncated,
+        'timestamp': timestamp,
+        'products': {
+            name: {'denials': counts[name], 'denial_records': records}
+            for name, records in denial_records.items()
+        },
+    }
+
+
+def _item_denials(denials: dict[str, Any], item: str) -> dict[str, Any]:
+    return {
+        **denials['products'].get(item, {'denials': 0, 'denial_records': []}),
+        'denials_truncated': denials['truncated'],
+        'denials_timestamp': denials['timestamp'],
+    }
+
+
+def _parse_compact(string_table: StringTable) -> JSONSection:
+    # displayName is the only column that may contain the separator
+    return {
+        name: {
+            'code': code,
+            'displayName': name,
+            'regularInUse': int(regular_in_use),
+            'regularTotal': int(regular_total),
+            'trueUpInUse': int(trueup_in_use),
+            'trueUpTotal': int(trueup_total),
+            'virtualInUse': int(virtual_in_use),
+            'virtualTotal': int(virtual_total),
+        }
+        for code, *name_parts, regular_in_use, regular_total, trueup_in_use, trueup_total, virtual_in_use, virtual_total in string_table
+        for name in ['|'.join(name_parts)]
+    }
 
 
 def parse_jetbrains_licensevault(string_table: StringTable) -> JSONSection:
     if string_table:
-        denial_cutoff = datetime.datetime.now(datetime.UTC) - datetime.timedelta(days=1)
+        match string_table[0]:
+            case ['version', '2']:
+                return _parse_compact(string_table[1:])
+            case ['version', version]:
+                raise ValueError(f"Unsupported section version {version}")
+        # Version 1 is a single JSON line without a version row
         string_table = json.loads(string_table[0][0])
+        if 'denials' not in string_table:
+            return {lic['displayName']: lic for lic in string_table.get('licenseUsages')}
+        # Agents before the separate denial section sent the denials along with the usage
+        denials = _parse_denials(string_table['denials'], string_table.get('denials_truncated', False))
         return {
             lic['displayName']: {
                 **lic,
-                'denials': sum(
-                    1
-                    for d in string_table.get('denials', [])
-                    if d['product_name'] == lic['displayName'] and datetime.datetime.fromisoformat(d['timestamp']) > denial_cutoff
-                ),
+                **_item_denials(denials, lic['displayName']),
             }
             for lic in string_table.get('licenseUsages')
         }
@@ -64,35 +149,379 @@ agent_section_jetbrains_licensevault = AgentSection(
 )
 
 
-def discovery_jetbrains_licensevault(section: JSONSection | None) -> DiscoveryResult:
-    if section is None:
+def parse_jetbrains_licensevault_denials(string_table: StringTable) -> DenialSection:
+    if string_table:
+        string_table = json.loads(string_table[0][0])
+        return _parse_denials(
+            string_table.get('denials', []),
+            string_table.get('denials_truncated', False),
+            string_table.get('timestamp'),
+        )
+    return None
+
+
+agent_section_jetbrains_licensevault_denials = AgentSection(
+    name='jetbrains_licensevault_denials',
+    parse_function=parse_jetbrains_licensevault_denials,
+)
+
+
+def discovery_jetbrains_licensevault(
+    section_jetbrains_licensevault: JSONSection | None,
+    section_jetbrains_licensevault_denials: DenialSection | None,
+) -> DiscoveryResult:
+    if section_jetbrains_licensevault is None:
         return
-    for name, lic in section.items():
+    for name, lic in section_jetbrains_licensevault.items():
         if lic['regularTotal'] > 0 or lic['trueUpTotal'] > 0 or lic['virtualTotal'] > 0:
             yield Service(item=name)
 
 
-def check_jetbrains_licensevault(
-    item: str,
+def _count_denials(denial_log: list[tuple[float, str]], value_store: MutableMapping[str, Any]) -> int:
+    # Count every denial record once, no matter how often the agent reports it
+    seen = value_store.get('denials_seen')
+    if seen is not None and not next(iter(seen), '{').startswith('{'):
+        # Fingerprints of an older version, take the records as seen again
+        seen = None
+    if seen is None:
+        seen = {fingerprint: timestamp for timestamp, fingerprint in denial_log}
+        counter = value_store.get('denials_counter', 0)
+    else:
+        counter = value_store.get('denials_counter', 0)
+        for timestamp, fingerprint in denial_log:
+            if fingerprint not in seen:
+                seen[fingerprint] = timestamp
+                counter += 1
+    if denial_log:
+        # Records older than the agent lookback will not show up again
+        horizon = min(timestamp for timestamp, _ in denial_log)
+        seen = {fingerprint: timestamp for fingerprint, timestamp in seen.items() if timestamp >= horizon}
+    value_store['denials_seen'] = seen
+    value_store['denials_counter'] = counter
+    return counter
+
+
+def _check_denial_rate(
     params: dict,
-    section: JSONSection | None,
+    denial_records: list[dict],
+    value_store: MutableMapping[str, Any],
+    report_time: float,
 ) -> CheckResult:
-    if item not in section:
-        yield Result(state=State.UNKNOWN, summary=f"License'{item}' not found")
+    # The agent may send the same cached report for several check cycles. Count
+    # each report once and at its own timestamp, or the rate drops to 0 between
+    # refreshes and spikes on each of them.
+    if value_store.get('denials_report') != report_time:
+        value_store['denials_report'] = report_time
+        counter = _count_denials(_denial_log(denial_records), value_store)
+        try:
+            rate = get_rate(value_store, 'denials_rate', report_time, counter) * 60
+        except GetRateError:
+            return
+        burst = get_average(value_store, 'denials_burst', report_time, rate, backlog_minutes=params.get('backlog', 15))
+        value_store['denials_last'] = (rate, burst)
+    if 'denials_last' not in value_store:
         return
+    rate, burst = value_store['denials_last']
 
-    lic = section[item]
+    yield from check_levels(
+        value=rate,
+        levels_upper=params.get('rate_levels'),
+        metric_name='denials_rate',
+        render_func=lambda v: f"{v:.2f}/min",
+        label="Denial rate",
+        boundaries=(0, None),
+        notice_only=True,
+    )
 
     yield from check_levels(
-        value=lic['denials'],
-        levels_upper=params.get('denials', ('fixed', (1, 1))),
-        metric_name='denials_24h',
-        render_func=int,
-        label="Denials in 24H",
+        value=burst,
+        levels_upper=params.get('burst_levels'),
+        metric_name='denials_burst',
+        render_func=lambda v: f"{v:.2f}/min",
+        label=f"Denial burst ({params.get('backlog', 15)} min average)",
         boundaries=(0, None),
         notice_only=True,
     )
 
+
+def _pool_metrics(pool: str, in_use: int, total: int) -> CheckResult:
+    yield Metric(f'{pool}_total', total)
+    yield Metric(f'{pool}_free', total - in_use)
+    if total > 0:
+        yield Metric(f'{pool}_util_percent', in_use / total * 100, boundaries=(0, 100))
+
+
+def _update_saturation(state: dict | None, now: float, saturated: bool, window: float) -> dict:
+    """Account the time since the last check to the saturation state seen back then.
+
+    The window is split into a fixed ring of buckets, so state size and work per
+    check do not depend on the check interval or window length."""
+    bucket_len = window / SATURATION_BUCKETS
+    if state is None or state['window'] != window or now < state['last'] - window:
+        return {
+            'window': window,
+            'last': now,
+            'saturated': saturated,
+            'head': int(now // bucket_len),
+            'sat': [0.0] * SATURATION_BUCKETS,
+            'obs': [0.0] * SATURATION_BUCKETS,
+        }
+
+    if now < state['last']:
+        # A clock gone back adds nothing. The ring already holds the time up to
+        # the last check, accounting goes on from there.
+        state['saturated'] = saturated
+        return state
+
+    start = max(state['last'], now - window)
+    while start < now:
+        index = int(start // bucket_len)
+        end = min(now, (index + 1) * bucket_len)
+        if index - state['head'] >= SATURATION_BUCKETS:
+            state['sat'] = [0.0] * SATURATION_BUCKETS
+            state['obs'] = [0.0] * SATURATION_BUCKETS
+            state['head'] = index
+        while state['head'] < index:
+            state['head'] += 1
+            state['sat'][state['head'] % SATURATION_BUCKETS] = 0.0
+            state['obs'][state['head'] % SATURATION_BUCKETS] = 0.0
+        state['obs'][index % SATURATION_BUCKETS] += end - start
+        if state['saturated']:
+            state['sat'][index % SATURATION_BUCKETS] += end - start
+        start = end
+
+    state['last'] = now
+    state['saturated'] = saturated
+    return state
+
+
+def _check_saturation(
+    params: dict,
+    lic: dict,
+    value_store: MutableMapping[str, Any],
+    now: float,
+) -> CheckResult:
+    threshold = params.get('threshold', 100.0)
+    window = params.get('window', 7 * 24 * 3600)
+    for pool, key, label in POOLS:
+        total = lic[f'{key}Total']
+        if total <= 0:
+            continue
+        state = _update_saturation(
+            value_store.get(f'saturation_{pool}'),
+            now,
+            lic[f'{key}InUse'] >= total * threshold / 100,
+            window,
+        )
+        value_store[f'saturation_{pool}'] = state
+
+        saturated = sum(state['sat'])
+        observed = sum(state['obs'])
+        yield from check_levels(
+            value=saturated / observed * 100 if observed else 0.0,
+            levels_upper=params.get('levels'),
+            metric_name=f'{pool}_saturated_percent',
+            render_func=render.percent,
+            label=f"{label} saturated",
+            boundaries=(0, 100),
+            notice_only=True,
+        )
+        yield Result(
+            state=State.OK,
+            notice=f"{label} saturated for {render.timespan(saturated)} in the last {render.timespan(window)}",
+        )
+        yield Metric(f'{pool}_saturated_seconds', saturated)
+
+
+def _update_forecast(state: dict | None, now: float, in_use: float, window: float) -> dict:
+    """Add a sample to the ring buffer if the sample interval has passed.
+
+    The sums of the least squares fit are kept along with the ring, so adding a
+    sample and fitting the trend does not depend on the number of samples."""
+    # A clock gone back falls short of the interval and adds no sample, only
+    # when it went back by more than the window the ring holds nothing of the present
+    if state is None or state['window'] != window or now < state['last'] - window:
+        state = {
+            'window': window,
+            'last': None,
+            't0': now,
+            'pos': 0,
+            'samples': [],
+            'sums': [0.0, 0.0, 0.0, 0.0],
+        }
+    elif now - state['last'] < window / FORECAST_SAMPLES:
+        return state
+
+    sums = state['sums']
+    if len(state['samples']) == FORECAST_SAMPLES:
+        t, y = state['samples'][state['pos']]
+        t -= state['t0']
+        sums[0] -= t
+        sums[1] -= y
+        sums[2] -= t * t
+        sums[3] -= t * y
+        state['samples'][state['pos']] = (now, in_use)
+    else:
+        state['samples'].append((now, in_use))
+    t = now - state['t0']
+    sums[0] += t
+    sums[1] += in_use
+    sums[2] += t * t
+    sums[3] += t * in_use
+    state['pos'] = (state['pos'] + 1) % FORECAST_SAMPLES
+    state['last'] = now
+
+    if state['pos'] == 0:
+        # Once per round rebase the sums onto the oldest sample to keep them precise
+        state['t0'] = min(t for t, _ in state['samples'])
+        state['sums'] = [
+            sum(t - state['t0'] for t, _ in state['samples']),
+            sum(y for _, y in state['samples']),
+            sum((t - state['t0']) ** 2 for t, _ in state['samples']),
+            sum((t - state['t0']) * y for t, y in state['samples']),
+        ]
+    return state
+
+
+def _time_to_exhaustion(state: dict, now: float, total: float) -> float | None:
+    n = len(state['samples'])
+    sum_t, sum_y, sum_tt, sum_ty = state['sums']
+    denominator = n * sum_tt - sum_t * sum_t
+    if n < 3 or denominator <= 0:
+        return None
+    slope = (n * sum_ty - sum_t * sum_y) / denominator
+    if slope <= 0:
+        return None
+    predicted = (sum_y - slope * sum_t) / n + slope * (now - state['t0'])
+    return max(0.0, (total - predicted) / slope)
+
+
+def _check_forecast(
+    params: dict,
+    lic: dict,
+    value_store: MutableMapping[str, Any],
+    now: float,
+) -> CheckResult:
+    window = params.get('window', 7 * 24 * 3600)
+    for pool, key, label in POOLS:
+        total = lic[f'{key}Total']
+        if total <= 0:
+            continue
+        state = _update_forecast(value_store.get(f'forecast_{pool}'), now, lic[f'{key}InUse'], window)
+        value_store[f'forecast_{pool}'] = state
+
+        remaining = _time_to_exhaustion(state, now, total)
+        if remaining is None:
+            yield Result(state=State.OK, notice=f"{label} exhaustion: not expected")
+            continue
+        yield from check_levels(
+            value=remaining,
+            levels_lower=params.get('levels'),
+            metric_name=f'{pool}_time_to_exhaustion',
+            render_func=render.timespan,
+            label=f"{label} exhaustion in",
+            boundaries=(0, None),
+            notice_only=True,
+        )
+
+
+def _billing_period(now: float, period: str, reset_day: int) -> tuple[float, float]:
+    """Start and end of the billing period containing now, in local time."""
+    months = BILLING_MONTHS[period]
+    today = datetime.datetime.fromtimestamp(now)
+    index = (today.year * 12 + today.month - 1) // months * months
+
+    def start(index):
+        return datetime.datetime(index // 12, index % 12 + 1, reset_day).timestamp()
+
+    if now < start(index):
+        index -= months
+    return start(index), start(index + months)
+
+
+def _update_license_hours(state: dict | None, now: float, in_use: float, period_start: float) -> dict:
+    if state is None:
+        return {'period_start': period_start, 'last': now, 'in_use': in_use, 'hours': 0.0}
+    if now < state['last']:
+        # A clock gone back adds nothing, only a new period starts over
+        hours = state['hours'] if state['period_start'] == period_start else 0.0
+    elif state['period_start'] != period_start:
+        # The previous usage is held from the period reset up to now
+        hours = state['in_use'] * (now - max(period_start, state['last'])) / 3600
+    else:
+        hours = state['hours'] + (state['in_use'] + in_use) / 2 * (now - state['last']) / 3600
+    return {'period_start': period_start, 'last': now, 'in_use': in_use, 'hours': hours}
+
+
+def _check_license_hours(
+    params: dict,
+    lic: dict,
+    value_store: MutableMapping[str, Any],
+    now: float,
+) -> CheckResult:
+    period_start, period_end = _billing_period(now, params.get('period', 'month'), params.get('reset_day', 1))
+    for pool, key, label in POOLS:
+        if pool not in params.get('pools', ['trueup']):
+            continue
+        in_use = lic[f'{key}InUse']
+        state = _update_license_hours(value_store.get(f'license_hours_{pool}'), now, in_use, period_start)
+        value_store[f'license_hours_{pool}'] = state
+
+        yield from check_levels(
+            value=state['hours'],
+            metric_name=f'{pool}_license_hours',
+            render_func=lambda v: f"{v:.1f} h",
+            label=f"{label} license hours this period",
+            boundaries=(0, None),
+            notice_only=True,
+        )
+        yield from check_levels(
+            value=state['hours'] + in_use * (period_end - now) / 3600,
+            levels_upper=params.get('levels'),
+            metric_name=f'{pool}_license_hours_projected',
+            render_func=lambda v: f"{v:.1f} h",
+            label=f"{label} license hours projected",
+            boundaries=(0, None),
+            notice_only=True,
+        )
+
+
+def check_jetbrains_licensevault(
+    item: str,
+    params: dict,
+    section_jetbrains_licensevault: JSONSection | None,
+    section_jetbrains_licensevault_denials: DenialSection | None,
+) -> CheckResult:
+    if section_jetbrains_licensevault is None or item not in section_jetbrains_licensevault:
+        yield Result(state=State.UNKNOWN, summary=f"License'{item}' not found")
+        return
+
+    lic = section_jetbrains_licensevault[item]
+    if section_jetbrains_licensevault_denials is not None:
+        lic = {**lic, **_item_denials(section_jetbrains_licensevault_denials, item)}
+
+    if 'denials' in lic:
+        yield from check_levels(
+            value=lic['denials'],
+            levels_upper=params.get('denials', ('fixed', (1, 1))),
+            metric_name='denials_24h',
+            render_func=int,
+            label="Denials in 24H",
+            boundaries=(0, None),
+            notice_only=True,
+        )
+        if lic['denials_truncated']:
+            yield Result(state=State.OK, summary="Denial report truncated, denial counts are incomplete")
+
+        if 'denial_rate' in params:
+            yield from _check_denial_rate(
+                params['denial_rate'],
+                lic['denial_records'],
+                get_value_store(),
+                # Sections without a report timestamp are fresh on every run
+                lic.get('denials_timestamp') or time.time(),
+            )
+
     levels_upper = params.get('regular_upper', None)
     match levels_upper:
         case ('used', level):
@@ -114,7 +543,7 @@ def check_jetbrains_licensevault(
         boundaries=(0, lic['regularTotal']),
         notice_only='regular_upper' not in params and lic.get('regularTotal', 0) == 0,
     )
-    yield Metric('regular_total', lic['regularTotal'])
+    yield from _pool_metrics('regular', lic['regularInUse'], lic['regularTotal'])
 
     levels_upper = params.get('virtual_upper', None)
     match levels_upper:
@@ -137,7 +566,7 @@ def check_jetbrains_licensevault(
         boundaries=(0, lic['virtualTotal']),
         notice_only='virtual_inuse' not in params and lic.get('virtualTotal', 0) == 0,
     )
-    yield Metric('virtual_total', lic['virtualTotal'])
+    yield from _pool_metrics('virtual', lic['virtualInUse'], lic['virtualTotal'])
 
     levels_upper = params.get('trueup_upper', None)
     match levels_upper:
@@ -160,12 +589,22 @@ def check_jetbrains_licensevault(
         boundaries=(0, lic['trueUpTotal']),
         notice_only='trueup_inuse' not in params and lic.get('trueUpTotal', 0) == 0,
     )
-    yield Metric('trueup_total', lic['trueUpTotal'])
+    yield from _pool_metrics('trueup', lic['trueUpInUse'], lic['trueUpTotal'])
+
+    if 'saturation' in params:
+        yield from _check_saturation(params['saturation'], lic, get_value_store(), time.time())
+
+    if 'forecast' in params:
+        yield from _check_forecast(params['forecast'], lic, get_value_store(), time.time())
+
+    if 'license_hours' in params:
+        yield from _check_license_hours(params['license_hours'], lic, get_value_store(), time.time())
 
 
 check_plugin_jetbrains_licensevault = CheckPlugin(
     name='jetbrains_licensevault',
     service_name='LicenseVault %s',
+    sections=['jetbrains_licensevault', 'jetbrains_licensevault_denials'],
     discovery_function=discovery_jetbrains_licensevault,
     check_function=check_jetbrains_licensevault,
     check_default_parameters={},
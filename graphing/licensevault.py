@@ -42,6 +42,48 @@ metric_trueup_inuse = metrics.Metric(
     color=metrics.Color.DARK_PURPLE,
 )
 
+metric_regular_free = metrics.Metric(
+    name='regular_free',
+    title=metrics.Title('Regular free'),
+    unit=metrics.Unit(metrics.DecimalNotation("")),
+    color=metrics.Color.LIGHT_GREEN,
+)
+
+metric_virtual_free = metrics.Metric(
+    name='virtual_free',
+    title=metrics.Title('Virtual free'),
+    unit=metrics.Unit(metrics.DecimalNotation("")),
+    color=metrics.Color.LIGHT_BLUE,
+)
+
+metric_trueup_free = metrics.Metric(
+    name='trueup_free',
+    title=metrics.Title('Postpaid available'),
+    unit=metrics.Unit(metrics.DecimalNotation("")),
+    color=metrics.Color.LIGHT_PURPLE,
+)
+
+metric_regular_util_percent = metrics.Metric(
+    name='regular_util_percent',
+    title=metrics.Title('Regular utilization'),
+    unit=metrics.Unit(metrics.DecimalNotation("%")),
+    color=metrics.Color.GREEN,
+)
+
+metric_virtual_util_percent = metrics.Metric(
+    name='virtual_util_percent',
+    title=metrics.Title('Virtual utilization'),
+    unit=metrics.Unit(metrics.DecimalNotation("%")),
+    color=metrics.Color.BLUE,
+)
+
+metric_trueup_util_percent = metrics.Metric(
+    name='trueup_util_percent',
+    title=metrics.Title('Postpaid utilization'),
+    unit=metrics.Unit(metrics.DecimalNotation("%")),
+    color=metrics.Color.PURPLE,
+)
+
 metric_denials = metrics.Metric(
     name='denials_24h',
     title=metrics.Title('Denials in 24h'),
@@ -49,39 +91,164 @@ metric_denials = metrics.Metric(
     color=metrics.Color.RED,
 )
 
+metric_denials_rate = metrics.Metric(
+    name='denials_rate',
+    title=metrics.Title('Denial rate'),
+    unit=metrics.Unit(metrics.DecimalNotation("/min")),
+    color=metrics.Color.ORANGE,
+)
+
+metric_denials_burst = metrics.Metric(
+    name='denials_burst',
+    title=metrics.Title('Denial burst'),
+    unit=metrics.Unit(metrics.DecimalNotation("/min")),
+    color=metrics.Color.DARK_RED,
+)
+
+metric_regular_saturated_percent = metrics.Metric(
+    name='regular_saturated_percent',
+    title=metrics.Title('Regular saturated'),
+    unit=metrics.Unit(metrics.DecimalNotation("%")),
+    color=metrics.Color.DARK_GREEN,
+)
+
+metric_virtual_saturated_percent = metrics.Metric(
+    name='virtual_saturated_percent',
+    title=metrics.Title('Virtual saturated'),
+    unit=metrics.Unit(metrics.DecimalNotation("%")),
+    color=metrics.Color.DARK_BLUE,
+)
+
+metric_trueup_saturated_percent = metrics.Metric(
+    name='trueup_saturated_percent',
+    title=metrics.Title('Postpaid saturated'),
+    unit=metrics.Unit(metrics.DecimalNotation("%")),
+    color=metrics.Color.DARK_PURPLE,
+)
+
+metric_regular_saturated_seconds = metrics.Metric(
+    name='regular_saturated_seconds',
+    title=metrics.Title('Regular saturated time'),
+    unit=metrics.Unit(metrics.TimeNotation()),
+    color=metrics.Color.GREEN,
+)
+
+metric_virtual_saturated_seconds = metrics.Metric(
+    name='virtual_saturated_seconds',
+    title=metrics.Title('Virtual saturated time'),
+    unit=metrics.Unit(metrics.TimeNotation()),
+    color=metrics.Color.BLUE,
+)
+
+metric_trueup_saturated_seconds = metrics.Metric(
+    name='trueup_saturated_seconds',
+    title=metrics.Title('Postpaid saturated time'),
+    unit=metrics.Unit(metrics.TimeNotation()),
+    color=metrics.Color.PURPLE,
+)
+
+metric_regular_time_to_exhaustion = metrics.Metric(
+    name='regular_time_to_exhaustion',
+    title=metrics.Title('Regular time to exhaustion'),
+    unit=metrics.Unit(metrics.TimeNotation()),
+    color=metrics.Color.GREEN,
+)
+
+metric_virtual_time_to_exhaustion = metrics.Metric(
+    name='virtual_time_to_exhaustion',
+    title=metrics.Title('Virtual time to exhaustion'),
+    unit=metrics.Unit(metrics.TimeNotation()),
+    color=metrics.Color.BLUE,
+)
+
+metric_trueup_time_to_exhaustion = metrics.Metric(
+    name='trueup_time_to_exhaustion',
+    title=metrics.Title('Postpaid time to exhaustion'),
+    unit=metrics.Unit(metrics.TimeNotation()),
+    color=metrics.Color.PURPLE,
+)
+
+metric_regular_license_hours = metrics.Metric(
+    name='regular_license_hours',
+    title=metrics.Title('Regular license hours'),
+    unit=metrics.Unit(metrics.DecimalNotation("h")),
+    color=metrics.Color.DARK_GREEN,
+)
+
+metric_regular_license_hours_projected = metrics.Metric(
+    name='regular_license_hours_projected',
+    title=metrics.Title('Regular license hours projected'),
+    unit=metrics.Unit(metrics.DecimalNotation("h")),
+    color=metrics.Color.LIGHT_GREEN,
+)
+
+metric_virtual_license_hours = metrics.Metric(
+    name='virtual_license_hours',
+    title=metrics.Title('Virtual license hours'),
+    unit=metrics.Unit(metrics.DecimalNotation("h")),
+    color=metrics.Color.DARK_BLUE,
+)
+
+metric_virtual_license_hours_projected = metrics.Metric(
+    name='virtual_license_hours_projected',
+    title=metrics.Title('Virtual license hours projected'),
+    unit=metrics.Unit(metrics.DecimalNotation("h")),
+    color=metrics.Color.LIGHT_BLUE,
+)
+
+metric_trueup_license_hours = metrics.Metric(
+    name='trueup_license_hours',
+    title=metrics.Title('Postpaid license hours'),
+    unit=metrics.Unit(metrics.DecimalNotation("h")),
+    color=metrics.Color.DARK_PURPLE,
+)
+
+metric_trueup_license_hours_projected = metrics.Metric(
+    name='trueup_license_hours_projected',
+    title=metrics.Title('Postpaid license hours projected'),
+    unit=metrics.Unit(metrics.DecimalNotation("h")),
+    color=metrics.Color.LIGHT_PURPLE,
+)
+
 graph_inuse = graphs.Graph(
     name='inuse',
     title=graphs.Title('License Usage'),
     minimal_range=graphs.MinimalRange(0, 1),
     compound_lines=[
         'regular_inuse',
-        metrics.Difference(
-            graphs.Title("Regular free"),
-            metrics.Color.LIGHT_GREEN,
-            minuend="regular_total",
-            subtrahend="regular_inuse",
-        ),
+        'regular_free',
         'virtual_inuse',
-        metrics.Difference(
-            graphs.Title("Virtual free"),
-            metrics.Color.LIGHT_BLUE,
-            minuend="virtual_total",
-            subtrahend="virtual_inuse",
-        ),
+        'virtual_free',
         'trueup_inuse',
-        metrics.Difference(
-            graphs.Title("Postpaid available"),
-            metrics.Color.LIGHT_PURPLE,
-            minuend="trueup_total",
-            subtrahend="trueup_inuse",
-        ),
+        'trueup_free',
     ],
     optional=[
         'trueup_inuse',
-        'trueup_total',
+        'trueup_free',
     ],
 )
 
+graph_regular_util_percent = graphs.Graph(
+    name='regular_util_percent',
+    title=graphs.Title('Regular license utilization'),
+    minimal_range=graphs.MinimalRange(0, 100),
+    simple_lines=['regular_util_percent'],
+)
+
+graph_virtual_util_percent = graphs.Graph(
+    name='virtual_util_percent',
+    title=graphs.Title('Virtual license utilization'),
+    minimal_range=graphs.MinimalRange(0, 100),
+    simple_lines=['virtual_util_percent'],
+)
+
+graph_trueup_util_percent = graphs.Graph(
+    name='trueup_util_percent',
+    title=graphs.Title('Postpaid license utilization'),
+    minimal_range=graphs.MinimalRange(0, 100),
+    simple_lines=['trueup_util_percent'],
+)
+
 graph_denials = graphs.Graph(
     name='denials',
     title=graphs.Title('Licens Denials in 24h'),
@@ -91,10 +258,81 @@ graph_denials = graphs.Graph(
     ],
 )
 
-perfometer_licensevault = perfometers.Perfometer(
-    name='licensevault',
-    focus_range=perfometers.FocusRange(perfometers.Closed(0), perfometers.Closed(
-        metrics.Sum(metrics.Title(''), metrics.Color.BLUE, ['regular_total', 'virtual_total', 'trueup_total'])
-    )),
-    segments=['regular_inuse', 'virtual_inuse', 'trueup_inuse',]
+graph_denials_rate = graphs.Graph(
+    name='denials_rate',
+    title=graphs.Title('License Denial rate'),
+    minimal_range=graphs.MinimalRange(0, 1),
+    simple_lines=[
+        'denials_rate',
+        'denials_burst',
+    ],
+)
+
+graph_regular_saturated_percent = graphs.Graph(
+    name='regular_saturated_percent',
+    title=graphs.Title('Regular license pool saturation'),
+    minimal_range=graphs.MinimalRange(0, 100),
+    simple_lines=['regular_saturated_percent'],
+)
+
+graph_virtual_saturated_percent = graphs.Graph(
+    name='virtual_saturated_percent',
+    title=graphs.Title('Virtual license pool saturation'),
+    minimal_range=graphs.MinimalRange(0, 100),
+    simple_lines=['virtual_saturated_percent'],
+)
+
+graph_trueup_saturated_percent = graphs.Graph(
+    name='trueup_saturated_percent',
+    title=graphs.Title('Postpaid license pool saturation'),
+    minimal_range=graphs.MinimalRange(0, 100),
+    simple_lines=['trueup_saturated_percent'],
+)
+
+graph_regular_license_hours = graphs.Graph(
+    name='regular_license_hours',
+    title=graphs.Title('Regular license hours'),
+    minimal_range=graphs.MinimalRange(0, 1),
+    simple_lines=[
+        'regular_license_hours_projected',
+        'regular_license_hours',
+    ],
+)
+
+graph_virtual_license_hours = graphs.Graph(
+    name='virtual_license_hours',
+    title=graphs.Title('Virtual license hours'),
+    minimal_range=graphs.MinimalRange(0, 1),
+    simple_lines=[
+        'virtual_license_hours_projected',
+        'virtual_license_hours',
+    ],
+)
+
+graph_trueup_license_hours = graphs.Graph(
+    name='trueup_license_hours',
+    title=graphs.Title('Postpaid license hours'),
+    minimal_range=graphs.MinimalRange(0, 1),
+    simple_lines=[
+        'trueup_license_hours_projected',
+        'trueup_license_hours',
+    ],
+)
+
+perfometer_licensevault_regular = perfometers.Perfometer(
+    name='licensevault_regular',
+    focus_range=perfometers.FocusRange(perfometers.Closed(0), perfometers.Closed(100)),
+    segments=['regular_util_percent'],
+)
+
+perfometer_licensevault_virtual = perfometers.Perfometer(
+    name='licensevault_virtual',
+    focus_range=perfometers.FocusRange(perfometers.Closed(0), perfometers.Closed(100)),
+    segments=['virtual_util_percent'],
+)
+
+perfometer_licensevault_trueup = perfometers.Perfometer(
+    name='licensevault_trueup',
+    focus_range=perfometers.FocusRange(perfometers.Closed(0), perfometers.Closed(100)),
+    segments=['trueup_util_percent'],
 )
@@ -20,11 +20,17 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
 from typing import Optional, Sequence
+import json
 import logging
+import os
 import requests
+import socket
+import time
 from functools import cached_property
 from json import JSONDecodeError
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from urllib.parse import urlsplit
 
 from cmk.special_agents.v0_unstable.agent_common import (
     CannotRecover,
@@ -32,12 +38,51 @@ from cmk.special_agents.v0_unstable.agent_common import (
     special_agent_main,
 )
 from cmk.special_agents.v0_unstable.argument_parsing import Args, create_default_argument_parser
+from cmk.utils.paths import omd_root, tmp_dir, var_dir
 
 import urllib3
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 LOGGING = logging.getLogger('agent_jetbrains_licensevault')
 
+# Time kept back from the deadline to write out the sections
+DEADLINE_RESERVE = 1.0
+
+# Facility local0, severity warning
+EVENT_PRIORITY = 16 * 8 + 4
+# SD-ID of the structured data, 32473 is the example enterprise number of RFC 5612
+EVENT_SD_ID = 'licensevault@32473'
+EVENT_BATCH = 100
+
+# Column order of the compact usage section (version 2), must match agent_based/licensevault.py
+COMPACT_VERSION = 2
+COMPACT_COLUMNS = ('code', 'displayName', 'regularInUse', 'regularTotal', 'trueUpInUse', 'trueUpTotal', 'virtualInUse', 'virtualTotal')
+
+
+class Deadline:
+    '''Wall clock budget of one agent run or of one of its phases'''
+
+    def __init__(self, seconds, end=None):
+        self._end = time.monotonic() + seconds
+        if end is not None:
+            self._end = min(self._end, end)
+
+    def remaining(self):
+        return max(0.0, self._end - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def phase(self, seconds=None, reserve=0.0):
+        '''Sub budget ending after seconds, but at the latest reserve seconds before this one.'''
+        end = self._end - reserve
+        return Deadline(end - time.monotonic() if seconds is None else seconds, end=end)
+
+    def timeout(self, timeout):
+        '''Request timeout that still fits into the budget.'''
+        if timeout is None:
+            return self.remaining()
+        return min(timeout, self.remaining())
+
 
 class LVAPI:
     def __init__(self, url, key, timeout=None, verify_cert=True):
@@ -48,15 +93,21 @@ class LVAPI:
 
     @cached_property
     def _cli(self):
+        if not self._verify_cert:
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
         sess = requests.Session()
         sess.headers.update({'Authorization': f"Automation {self._key}"})
         return sess
 
-    def request(self, method, ressource, **kwargs):
+    def request(self, method, ressource, deadline=None, **kwargs):
         url = f"{self._url}/{ressource}"
+        timeout = self.timeout if deadline is None else deadline.timeout(self.timeout)
+        if timeout is not None and timeout <= 0:
+            # requests rejects a timeout of 0, and there is no time left anyway
+            raise CannotRecover(f"Out of time before trying to {method} {url}")
         LOGGING.debug(f">> {method} {url}")
         try:
-            resp = self._cli.request(method, url, verify=self._verify_cert, timeout=self.timeout, **kwargs)
+            resp = self._cli.request(method, url, verify=self._verify_cert, timeout=timeout, **kwargs)
             resp.raise_for_status()
             return resp.json()
         except requests.exceptions.HTTPError as exc:
@@ -66,26 +117,154 @@ class LVAPI:
                 raise CannotRecover(f"Not permited to access {url}.") from exc
             raise CannotRecover(f"Request error {exc.response.status_code} when trying to {method} {url}") from exc
         except requests.exceptions.ReadTimeout as exc:
-            raise CannotRecover(f"Read timeout after {self.timeout}s when trying to {method} {url}") from exc
+            raise CannotRecover(f"Read timeout after {timeout:.0f}s when trying to {method} {url}") from exc
         except requests.exceptions.ConnectionError as exc:
             raise CannotRecover(f"Could not {method} {url} ({exc})") from exc
         except JSONDecodeError as exc:
             raise CannotRecover(f"Couldn't parse JSON at {url}") from exc
 
-    def denials(self, days=1):
+    def denials(self, days=1, deadline=None, pagination='offset'):
+        '''Page through the denial report.
+
+        offset pages with an increasing offset. keyset moves the from bound to the
+        newest timestamp seen and drops the records at that timestamp it already
+        has, so denials arriving during the walk do not shift the pages. It needs
+        the report in ascending order, if a page shows otherwise the walk starts
+        over with offset.
+
+        With a deadline paging stops once it has expired or a page fails, and
+        the denials fetched so far are returned as truncated.'''
         denials = []
         yesterday = date.today() - timedelta(days)
+        start = yesterday.strftime('%Y-%m-%d')
         params = {
-            'from': yesterday.strftime('%Y-%m-%d'),
+            'from': start,
             'offset': 0,
             'limit': 100,
         }
+        cursor, seen = None, set()
         while True:
-            page = self.request('GET', 'public-api/denials/report', params=params)
-            denials += page
+            if deadline is not None and deadline.expired():
+                LOGGING.warning(f"Out of time after {len(denials)} denials, report is truncated")
+                return denials, True
+            try:
+                page = self.request('GET', 'public-api/denials/report', deadline=deadline, params=params)
+            except CannotRecover as exc:
+                if deadline is None:
+                    raise
+                LOGGING.warning(f"{exc}, report is truncated after {len(denials)} denials")
+                return denials, True
+            if pagination == 'keyset':
+                denials += [denial for denial in page if _denial_id(denial) not in seen]
+            else:
+                denials += page
             if len(page) < params['limit']:
-                return denials
-            params['offset'] += params['limit']
+                return denials, False
+            if pagination == 'keyset':
+                advanced = _advance_keyset(params, page, cursor, seen)
+                if advanced is None:
+                    LOGGING.warning("Denial report is not in ascending order, falling back to offset paging")
+                    pagination, denials = 'offset', []
+                    params.update({'from': start, 'offset': 0})
+                    continue
+                cursor, seen = advanced
+            else:
+                params['offset'] += params['limit']
+
+
+def _advance_keyset(params, page, cursor, seen):
+    '''Point params at the page after page and return the new cursor and the ids seen at it
+
+    Returns None if the page is not ascending or would move the cursor back.'''
+    timestamps = [(datetime.fromisoformat(denial['timestamp']), denial) for denial in page]
+    if any(later[0] < earlier[0] for earlier, later in zip(timestamps, timestamps[1:])):
+        return None
+    newest = timestamps[-1][0]
+    if cursor is not None and newest < cursor:
+        return None
+    at_newest = {_denial_id(denial) for timestamp, denial in timestamps if timestamp == newest}
+    if newest == cursor:
+        # The whole page shares the cursor timestamp, step over it by offset
+        params['offset'] += params['limit']
+        return cursor, seen | at_newest
+    params['from'] = next(denial['timestamp'] for timestamp, denial in timestamps if timestamp == newest)
+    params['offset'] = 0
+    return newest, at_newest
+
+
+def _denial_id(denial):
+    # All fields, two denials in the same second may differ only in version or reason
+    return json.dumps(denial, sort_keys=True)
+
+
+def _advance_cursor(cursor, records):
+    '''Move the cursor to the newest of the sorted records'''
+    if not records:
+        return cursor
+    timestamp = records[-1][0]
+    ids = {record_id for record_timestamp, record_id, _ in records if record_timestamp == timestamp}
+    if cursor['timestamp'] and datetime.fromisoformat(cursor['timestamp']) == timestamp:
+        ids.update(cursor['ids'])
+    return {'timestamp': timestamp.isoformat(), 'ids': sorted(ids)}
+
+
+class EventConsole:
+    '''Deliver syslog messages to the Event Console'''
+
+    def __init__(self, target, deadline=None):
+        self.target = target
+        self.deadline = deadline
+
+    def _connect(self):
+        timeout = None if self.deadline is None else self.deadline.remaining()
+        if timeout is not None and timeout <= 0:
+            # settimeout(0) would make the socket non-blocking instead
+            raise TimeoutError(f"Out of time before connecting to {self.target}")
+        scheme, _, address = self.target.partition(':')
+        if scheme == 'local':
+            scheme, address = 'unix', str(Path(omd_root) / 'tmp' / 'run' / 'mkeventd' / 'eventsocket')
+        if scheme == 'unix':
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            sock.connect(address)
+            return sock
+        host, _, port = address.rpartition(':')
+        if scheme == 'tcp':
+            return socket.create_connection((host, int(port)), timeout=timeout)
+        if scheme == 'udp':
+            sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_DGRAM)
+            sock.settimeout(timeout)
+            sock.connect((host, int(port)))
+            return sock
+        raise ValueError(f"Unknown Event Console target {self.target}")
+
+    def send(self, messages):
+        with self._connect() as sock:
+            if sock.type == socket.SOCK_DGRAM:  # one message per datagram
+                for message in messages:
+                    sock.send(message.encode('utf-8'))
+            else:
+                sock.sendall(''.join(f"{message}\n" for message in messages).encode('utf-8'))
+
+
+def _sd_escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace(']', '\\]')
+
+
+def denial_event(denial, hostname):
+    '''RFC 5424 message for a denial with the details as structured data'''
+    timestamp = datetime.fromisoformat(denial['timestamp']).isoformat()
+    details = {
+        'product': denial.get('product_name'),
+        'user': denial.get('username'),
+        'host': denial.get('user_hostname'),
+        'version': denial.get('product_version'),
+        'reason': denial.get('reason'),
+    }
+    data = ' '.join(f'{key}="{_sd_escape(value)}"' for key, value in details.items())
+    text = (f"License denied for {details['product']} {details['version']} to "
+            f"{details['user']}@{details['host']}: {details['reason']}")
+    return f"<{EVENT_PRIORITY}>1 {timestamp} {hostname} licensevault - denial [{EVENT_SD_ID} {data}] {text}"
 
 
 class AgentLicenseVault:
@@ -111,6 +290,62 @@ class AgentLicenseVault:
                             required=False,
                             default=10,
                             help='HTTP connection timeout. (Default: 10)')
+        parser.add_argument('--deadline',
+                            dest='deadline',
+                            type=float,
+                            required=False,
+                            default=50,
+                            help='Overall time budget of one agent run in seconds. (Default: 50)')
+        parser.add_argument('--denials-days',
+                            dest='denials_days',
+                            type=int,
+                            required=False,
+                            default=5,
+                            help='Days of denials to fetch from the report. (Default: 5)')
+        parser.add_argument('--denials-budget',
+                            dest='denials_budget',
+                            type=float,
+                            required=False,
+                            default=None,
+                            help='Time budget for paging the denial report in seconds. (Default: rest of the deadline)')
+        parser.add_argument('--pagination',
+                            dest='pagination',
+                            choices=['offset', 'keyset'],
+                            required=False,
+                            default='offset',
+                            help='Page the denial report by offset or by moving the from bound to the last timestamp seen. (Default: offset)')
+        parser.add_argument('--denials-interval',
+                            dest='denials_interval',
+                            type=int,
+                            required=False,
+                            default=900,
+                            help='Refresh the denial report only every this many seconds, 0 to refresh on every run. (Default: 900)')
+        parser.add_argument('--cache-dir',
+                            dest='cache_dir',
+                            type=Path,
+                            required=False,
+                            default=None,
+                            help='Directory to keep the last denial report and the Event Console cursor in. '
+                                 '(Default: tmp/check_mk/agents/agent_jetbrains_licensevault in the site for the report, '
+                                 'var/check_mk/agents/agent_jetbrains_licensevault for the cursor)')
+        parser.add_argument('--section-format',
+                            dest='section_format',
+                            choices=['json', 'compact'],
+                            required=False,
+                            default='json',
+                            help='Format of the usage section, compact writes one row per product. (Default: json)')
+        parser.add_argument('--event-console',
+                            dest='event_console',
+                            nargs='?',
+                            const='local',
+                            default=None,
+                            help='Forward new denials to the Event Console, either local for the one of this site '
+                                 'or unix:PATH, tcp:HOST:PORT or udp:HOST:PORT. Denials before the first run are not forwarded.')
+        parser.add_argument('--event-host',
+                            dest='event_host',
+                            required=False,
+                            default=None,
+                            help='Host name the events are sent for. (Default: host of the URL)')
         parser.add_argument('--ignore-cert',
                             dest='verify_cert',
                             action='store_false',
@@ -122,9 +357,102 @@ class AgentLicenseVault:
     def api(self):
         return LVAPI(self.args.url, self.args.key, timeout=self.args.timeout, verify_cert=self.args.verify_cert)
 
+    def cache_file(self, kind) -> Path:
+        cache_dir = self.args.cache_dir
+        if cache_dir is None:
+            # The site tmp is a tmpfs, the Event Console cursor has to survive a restart
+            cache_dir = Path(var_dir if kind == 'events' else tmp_dir) / 'agents' / 'agent_jetbrains_licensevault'
+        return cache_dir / f"{urlsplit(self.args.url).netloc.replace(':', '_')}.{kind}.json"
+
+    def load_cache(self, kind):
+        try:
+            return json.loads(self.cache_file(kind).read_text())
+        except (OSError, ValueError):
+            return None
+
+    def store_cache(self, kind, data):
+        path = self.cache_file(kind)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, path)
+
+    def denials(self, deadline, now):
+        cached = self.load_cache('denials') if self.args.denials_interval > 0 else None
+        if cached is not None and now - cached['timestamp'] < self.args.denials_interval:
+            LOGGING.debug(f"Reusing denial report from {cached['timestamp']}")
+            return cached
+
+        denials, truncated = self.api.denials(days=self.args.denials_days, deadline=deadline, pagination=self.args.pagination)
+        report = {'timestamp': int(now), 'denials': denials, 'denials_truncated': truncated}
+        if not truncated:
+            if self.args.denials_interval > 0:
+                self.store_cache('denials', report)
+            return report
+        # Only a complete report may stand in for the next runs, and the last
+        # one beats an incomplete refresh. It keeps its own timestamp.
+        if cached is not None:
+            LOGGING.warning(f"Denial report refresh is incomplete, reusing report from {cached['timestamp']}")
+            return cached
+        return report
+
+    def forward_denials(self, report, deadline, now):
+        '''Send every denial newer than the cursor to the Event Console once
+
+        Sending stops at the deadline, the rest follows on the next run.'''
+        cursor = self.load_cache('events')
+        records = sorted(
+            ((datetime.fromisoformat(d['timestamp']), _denial_id(d), d) for d in report['denials']),
+            key=lambda record: record[0],
+        )
+        # Cursors without a timestamp were stored from an empty report by older versions
+        if cursor is None or cursor['timestamp'] is None:
+            if report['denials_truncated']:
+                LOGGING.info("Denial report is incomplete, the Event Console cursor is placed on a later run")
+                return
+            LOGGING.info("Initializing Event Console cursor, older denials are not forwarded")
+            start = {'timestamp': datetime.fromtimestamp(now, timezone.utc).isoformat(), 'ids': []}
+            self.store_cache('events', _advance_cursor(start, records) if records else start)
+            return
+
+        cursor_timestamp = datetime.fromisoformat(cursor['timestamp'])
+        seen = set(cursor['ids'])
+        new = [
+            record for record in records
+            if record[0] > cursor_timestamp or (record[0] == cursor_timestamp and record[1] not in seen)
+        ]
+        console = EventConsole(self.args.event_console, deadline)
+        hostname = self.args.event_host or urlsplit(self.args.url).hostname
+        try:
+            for start in range(0, len(new), EVENT_BATCH):
+                batch = new[start:start + EVENT_BATCH]
+                console.send([denial_event(denial, hostname) for _, _, denial in batch])
+                cursor = _advance_cursor(cursor, batch)
+        except (OSError, ValueError) as exc:
+            LOGGING.warning(f"Could not forward denials to the Event Console ({exc})")
+        finally:
+            self.store_cache('events', cursor)
+
     def main(self, args: Args):
         self.args = args
+        deadline = Deadline(args.deadline)
         with SectionWriter('jetbrains_licensevault') as section:
-            usage = self.api.request('GET', 'public-api/licenses/usage')
-            usage['denials'] = self.api.denials(days=5)
-            section.append_json(usage)
+            usage = self.api.request('GET', 'public-api/licenses/usage', deadline=deadline)
+            if args.section_format == 'compact':
+                section.append(f"version|{COMPACT_VERSION}")
+                for lic in usage['licenseUsages']:
+                    # displayName may contain the separator, the parser joins it back
+                    section.append('|'.join(str(lic[column]) for column in COMPACT_COLUMNS))
+            else:
+                section.append_json(usage)
+
+        now = time.time()
+        report = self.denials(deadline.phase(args.denials_budget, reserve=DEADLINE_RESERVE), now)
+        section_name = 'jetbrains_licensevault_denials'
+        if args.denials_interval > 0:
+            section_name += f":cached({report['timestamp']},{args.denials_interval})"
+        with SectionWriter(section_name) as section:
+            section.append_json(report)
+
+        if args.event_console:
+            self.forward_denials(report, deadline.phase(reserve=DEADLINE_RESERVE), now)
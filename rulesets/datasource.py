@@ -24,11 +24,14 @@ from cmk.rulesets.v1.form_specs import (
     DefaultValue,
     DictElement,
     Dictionary,
+    Integer,
     migrate_to_password,
     Password,
     SingleChoice,
     SingleChoiceElement,
     String,
+    TimeMagnitude,
+    TimeSpan,
     validators,
 )
 from cmk.rulesets.v1.rule_specs import SpecialAgent, Topic
@@ -68,6 +71,95 @@ def _form_special_agents_jetbrains_licensevault() -> Dictionary:
                 ),
                 required=True,
             ),
+            'section_format': DictElement(
+                parameter_form=SingleChoice(
+                    title=Title('Format of the usage section'),
+                    help_text=Help(
+                        'The compact format writes one row per product instead of a single JSON document, '
+                        'which is smaller and cheaper to parse.'
+                    ),
+                    elements=[
+                        SingleChoiceElement(name='json', title=Title('JSON')),
+                        SingleChoiceElement(name='compact', title=Title('Compact')),
+                    ],
+                    prefill=DefaultValue('json'),
+                ),
+                required=False,
+            ),
+            'event_console': DictElement(
+                parameter_form=String(
+                    title=Title('Forward new denials to the Event Console'),
+                    help_text=Help(
+                        'Send every new denial once as a syslog message with product, user, host, version '
+                        'and reason as structured data. Use <tt>local</tt> for the Event Console of this site '
+                        'or one of <tt>unix:PATH</tt>, <tt>tcp:HOST:PORT</tt> and <tt>udp:HOST:PORT</tt>. '
+                        'Denials from before the first run are not forwarded.'
+                    ),
+                    prefill=DefaultValue('local'),
+                ),
+                required=False,
+            ),
+            'deadline': DictElement(
+                parameter_form=TimeSpan(
+                    title=Title('Overall time budget of one agent run'),
+                    help_text=Help(
+                        'The usage is fetched first and always written. The denial report is only paged '
+                        'as long as time remains and marked as truncated otherwise. Keep this below the '
+                        'timeout of the special agent.'
+                    ),
+                    displayed_magnitudes=[TimeMagnitude.SECOND],
+                    prefill=DefaultValue(50.0),
+                ),
+                required=False,
+            ),
+            'denials_days': DictElement(
+                parameter_form=Integer(
+                    title=Title('Days of denials to fetch'),
+                    help_text=Help(
+                        'The denial report is fetched for this many days. The denials in the last 24h need '
+                        'at least one day. With the denial rate enabled in the check a short lookback is enough.'
+                    ),
+                    unit_symbol='days',
+                    custom_validate=(validators.NumberInRange(min_value=1),),
+                    prefill=DefaultValue(5),
+                ),
+                required=False,
+            ),
+            'denials_budget': DictElement(
+                parameter_form=TimeSpan(
+                    title=Title('Time budget for paging the denial report'),
+                    displayed_magnitudes=[TimeMagnitude.SECOND],
+                    prefill=DefaultValue(30.0),
+                ),
+                required=False,
+            ),
+            'pagination': DictElement(
+                parameter_form=SingleChoice(
+                    title=Title('Pagination of the denial report'),
+                    help_text=Help(
+                        'Keyset pagination moves the start of the report to the last timestamp seen instead of '
+                        'increasing the offset, so denials arriving while the report is read do not shift the pages.'
+                    ),
+                    elements=[
+                        SingleChoiceElement(name='offset', title=Title('Offset')),
+                        SingleChoiceElement(name='keyset', title=Title('Keyset (timestamp cursor)')),
+                    ],
+                    prefill=DefaultValue('offset'),
+                ),
+                required=False,
+            ),
+            'denials_interval': DictElement(
+                parameter_form=TimeSpan(
+                    title=Title('Refresh interval of the denial report'),
+                    help_text=Help(
+                        'The usage is fetched on every run, the denial report only this often. In between '
+                        'the last report is sent again as a cached section. Set to 0 to fetch it on every run.'
+                    ),
+                    displayed_magnitudes=[TimeMagnitude.MINUTE],
+                    prefill=DefaultValue(900.0),
+                ),
+                required=False,
+            ),
         },
     )
 
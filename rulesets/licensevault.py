@@ -23,13 +23,22 @@ from cmk.rulesets.v1 import Help, Title
 from cmk.rulesets.v1.form_specs import (
     CascadingSingleChoice,
     CascadingSingleChoiceElement,
+    DefaultValue,
     DictElement,
     Dictionary,
+    Float,
     InputHint,
     Integer,
     LevelDirection,
+    MultipleChoice,
+    MultipleChoiceElement,
     Percentage,
     SimpleLevels,
+    SingleChoice,
+    SingleChoiceElement,
+    TimeMagnitude,
+    TimeSpan,
+    validators,
 )
 from cmk.rulesets.v1.rule_specs import CheckParameters, Topic, HostAndItemCondition
 
@@ -99,6 +108,165 @@ def _parameter_form_jetbrains_licensevault():
                 ),
                 required=False,
             ),
+            'denial_rate': DictElement(
+                parameter_form=Dictionary(
+                    title=Title('Denial rate'),
+                    help_text=Help(
+                        'Count every denial once in the value store and report the rate of new denials '
+                        'and its moving average. This works with a short agent lookback.'
+                    ),
+                    elements={
+                        'backlog': DictElement(
+                            parameter_form=Integer(
+                                title=Title('Averaging time for the burst'),
+                                unit_symbol='minutes',
+                                custom_validate=(validators.NumberInRange(min_value=1),),
+                                prefill=DefaultValue(15),
+                            ),
+                            required=False,
+                        ),
+                        'rate_levels': DictElement(
+                            parameter_form=SimpleLevels(
+                                title=Title('Denials per minute'),
+                                level_direction=LevelDirection.UPPER,
+                                form_spec_template=Float(unit_symbol='/min'),
+                                prefill_fixed_levels=InputHint(value=(1.0, 5.0)),
+                            ),
+                            required=False,
+                        ),
+                        'burst_levels': DictElement(
+                            parameter_form=SimpleLevels(
+                                title=Title('Averaged denials per minute'),
+                                level_direction=LevelDirection.UPPER,
+                                form_spec_template=Float(unit_symbol='/min'),
+                                prefill_fixed_levels=InputHint(value=(0.5, 1.0)),
+                            ),
+                            required=False,
+                        ),
+                    },
+                ),
+                required=False,
+            ),
+            'saturation': DictElement(
+                parameter_form=Dictionary(
+                    title=Title('Pool saturation'),
+                    help_text=Help(
+                        'Account the time each license pool spends at or above the utilization threshold '
+                        'and report it over a rolling window.'
+                    ),
+                    elements={
+                        'threshold': DictElement(
+                            parameter_form=Percentage(
+                                title=Title('Utilization counted as saturated'),
+                                prefill=DefaultValue(100.0),
+                            ),
+                            required=False,
+                        ),
+                        'window': DictElement(
+                            parameter_form=TimeSpan(
+                                title=Title('Rolling window'),
+                                displayed_magnitudes=[TimeMagnitude.DAY, TimeMagnitude.HOUR],
+                                prefill=DefaultValue(7 * 24 * 3600.0),
+                            ),
+                            required=False,
+                        ),
+                        'levels': DictElement(
+                            parameter_form=SimpleLevels(
+                                title=Title('Saturated time in percent of the window'),
+                                level_direction=LevelDirection.UPPER,
+                                form_spec_template=Percentage(),
+                                prefill_fixed_levels=InputHint(value=(10.0, 25.0)),
+                            ),
+                            required=False,
+                        ),
+                    },
+                ),
+                required=False,
+            ),
+            'forecast': DictElement(
+                parameter_form=Dictionary(
+                    title=Title('Pool exhaustion forecast'),
+                    help_text=Help(
+                        'Fit a linear trend to the usage of each license pool over the rolling window '
+                        'and report the time until the pool is expected to be fully used.'
+                    ),
+                    elements={
+                        'window': DictElement(
+                            parameter_form=TimeSpan(
+                                title=Title('Trend window'),
+                                displayed_magnitudes=[TimeMagnitude.DAY, TimeMagnitude.HOUR],
+                                prefill=DefaultValue(7 * 24 * 3600.0),
+                            ),
+                            required=False,
+                        ),
+                        'levels': DictElement(
+                            parameter_form=SimpleLevels(
+                                title=Title('Time until the pool is exhausted'),
+                                level_direction=LevelDirection.LOWER,
+                                form_spec_template=TimeSpan(
+                                    displayed_magnitudes=[TimeMagnitude.DAY, TimeMagnitude.HOUR],
+                                ),
+                                prefill_fixed_levels=InputHint(value=(30 * 24 * 3600.0, 7 * 24 * 3600.0)),
+                            ),
+                            required=False,
+                        ),
+                    },
+                ),
+                required=False,
+            ),
+            'license_hours': DictElement(
+                parameter_form=Dictionary(
+                    title=Title('License hours per billing period'),
+                    help_text=Help(
+                        'Integrate the licenses in use over time and report the license hours of the current '
+                        'billing period together with a projection to its end, assuming the current usage holds.'
+                    ),
+                    elements={
+                        'pools': DictElement(
+                            parameter_form=MultipleChoice(
+                                title=Title('License pools'),
+                                elements=[
+                                    MultipleChoiceElement(name='trueup', title=Title('Postpaid')),
+                                    MultipleChoiceElement(name='regular', title=Title('Regular')),
+                                    MultipleChoiceElement(name='virtual', title=Title('Virtual')),
+                                ],
+                                prefill=DefaultValue(['trueup']),
+                            ),
+                            required=False,
+                        ),
+                        'period': DictElement(
+                            parameter_form=SingleChoice(
+                                title=Title('Billing period'),
+                                elements=[
+                                    SingleChoiceElement(name='month', title=Title('Month')),
+                                    SingleChoiceElement(name='quarter', title=Title('Quarter')),
+                                    SingleChoiceElement(name='year', title=Title('Year')),
+                                ],
+                                prefill=DefaultValue('month'),
+                            ),
+                            required=False,
+                        ),
+                        'reset_day': DictElement(
+                            parameter_form=Integer(
+                                title=Title('Day of the month the billing period starts'),
+                                custom_validate=(validators.NumberInRange(min_value=1, max_value=28),),
+                                prefill=DefaultValue(1),
+                            ),
+                            required=False,
+                        ),
+                        'levels': DictElement(
+                            parameter_form=SimpleLevels(
+                                title=Title('Projected license hours at the end of the period'),
+                                level_direction=LevelDirection.UPPER,
+                                form_spec_template=Float(unit_symbol='h'),
+                                prefill_fixed_levels=InputHint(value=(1000.0, 2000.0)),
+                            ),
+                            required=False,
+                        ),
+                    },
+                ),
+                required=False,
+            ),
         }
     )
 
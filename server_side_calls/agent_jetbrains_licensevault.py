@@ -30,6 +30,13 @@ class Params(BaseModel):
     url: str
     key: Secret
     ignore_cert: str = 'check_cert'
+    section_format: str = 'json'
+    event_console: str | None = None
+    deadline: float | None = None
+    denials_days: int | None = None
+    denials_budget: float | None = None
+    denials_interval: float | None = None
+    pagination: str = 'offset'
 
 
 def commands_function(
@@ -42,6 +49,20 @@ def commands_function(
     ]
     if params.ignore_cert != 'check_cert':
         command_arguments += ['--ignore-cert']
+    if params.section_format != 'json':
+        command_arguments += ['--section-format', params.section_format]
+    if params.event_console is not None:
+        command_arguments += ['--event-console', params.event_console, '--event-host', host_config.name]
+    if params.deadline is not None:
+        command_arguments += ['--deadline', f"{params.deadline:.0f}"]
+    if params.denials_days is not None:
+        command_arguments += ['--denials-days', str(params.denials_days)]
+    if params.denials_budget is not None:
+        command_arguments += ['--denials-budget', f"{params.denials_budget:.0f}"]
+    if params.pagination != 'offset':
+        command_arguments += ['--pagination', params.pagination]
+    if params.denials_interval is not None:
+        command_arguments += ['--denials-interval', f"{params.denials_interval:.0f}"]
     yield SpecialAgentCommand(command_arguments=command_arguments)
 
 
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# checkmk_jetbrains_licensevault - Jetbrains LicenseVault Agent and checks
+#
+# Copyright (C) 2025  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import gc
+import json
+import os
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+
+import pytest  # type: ignore[import]
+
+BASELINE_FILE = Path(__file__).with_name('baselines.json')
+
+# Set LICENSEVAULT_BENCH_FULL=1 to include the large scales (1k products, 1M denials)
+BENCH_FULL = os.environ.get('LICENSEVAULT_BENCH_FULL') == '1'
+# Set LICENSEVAULT_BENCH_BASELINE=1 to compare against baselines.json. The
+# baselines only mean something on the machine they were recorded on.
+BENCH_BASELINE = os.environ.get('LICENSEVAULT_BENCH_BASELINE') == '1'
+# Set LICENSEVAULT_BENCH_UPDATE=1 to rewrite baselines.json from the current run
+BENCH_UPDATE = os.environ.get('LICENSEVAULT_BENCH_UPDATE') == '1'
+TIME_TOLERANCE = float(os.environ.get('LICENSEVAULT_BENCH_TIME_TOLERANCE', '1.25'))
+ALLOC_TOLERANCE = float(os.environ.get('LICENSEVAULT_BENCH_ALLOC_TOLERANCE', '1.15'))
+# Allowed growth of the per-item cost from the smallest to the largest scale.
+SCALING_TOLERANCE = float(os.environ.get('LICENSEVAULT_BENCH_SCALING_TOLERANCE', '3.0'))
+
+_REPORT: list['Measurement'] = []
+
+
+@dataclass
+class Measurement:
+    name: str
+    items: int
+    seconds: float
+    peak_bytes: int
+
+    @property
+    def seconds_per_item(self) -> float:
+        return self.seconds / self.items
+
+    @property
+    def bytes_per_item(self) -> float:
+        return self.peak_bytes / self.items
+
+
+def _measure(name, items, func, repeat=3) -> Measurement:
+    gc.collect()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    measurement = Measurement(name, items, min(timings), peak)
+    _REPORT.append(measurement)
+    return measurement
+
+
+class Baselines:
+    def __init__(self, path: Path):
+        self._path = path
+        self._data = json.loads(path.read_text()) if path.exists() else {}
+
+    def check(self, measurement: Measurement):
+        if BENCH_UPDATE:
+            self._data[measurement.name] = {
+                'seconds_per_item': measurement.seconds_per_item,
+                'bytes_per_item': measurement.bytes_per_item,
+            }
+            return
+        if not BENCH_BASELINE:
+            return
+        baseline = self._data.get(measurement.name)
+        if baseline is None:
+            pytest.fail(f"No baseline for {measurement.name}, run with LICENSEVAULT_BENCH_UPDATE=1")
+        assert measurement.seconds_per_item <= baseline['seconds_per_item'] * TIME_TOLERANCE, (
+            f"{measurement.name}: {measurement.seconds_per_item * 1e6:.2f}us/item exceeds baseline "
+            f"{baseline['seconds_per_item'] * 1e6:.2f}us/item x{TIME_TOLERANCE}"
+        )
+        assert measurement.bytes_per_item <= baseline['bytes_per_item'] * ALLOC_TOLERANCE, (
+            f"{measurement.name}: {measurement.bytes_per_item:.0f}B/item exceeds baseline "
+            f"{baseline['bytes_per_item']:.0f}B/item x{ALLOC_TOLERANCE}"
+        )
+
+    def save(self):
+        self._path.write_text(json.dumps(self._data, indent=4, sort_keys=True) + '\n')
+
+
+def _assert_linear(measurements: list[Measurement]):
+    smallest = measurements[0]
+    for measurement in measurements[1:]:
+        assert measurement.seconds_per_item <= smallest.seconds_per_item * SCALING_TOLERANCE, (
+            f"{measurement.name} scales worse than linear: {measurement.seconds_per_item * 1e6:.2f}us/item "
+            f"at {measurement.items} items vs {smallest.seconds_per_item * 1e6:.2f}us/item at {smallest.items} items"
+        )
+
+
+@pytest.fixture
+def parse_scales():
+    '''(products, denials) of the parse benchmark'''
+    return [(10, 1_000), (100, 10_000), (1_000, 100_000)] + ([(1_000, 1_000_000)] if BENCH_FULL else [])
+
+
+@pytest.fixture
+def product_scales():
+    return [10, 100, 1_000] + ([10_000] if BENCH_FULL else [])
+
+
+@pytest.fixture
+def cycle_scales():
+    '''Check cycles run against one value store'''
+    return [100, 1_000] + ([10_000] if BENCH_FULL else [])
+
+
+@pytest.fixture
+def measure():
+    return _measure
+
+
+@pytest.fixture
+def assert_linear():
+    return _assert_linear
+
+
+@pytest.fixture(scope='session')
+def baselines():
+    baselines = Baselines(BASELINE_FILE)
+    yield baselines
+    if BENCH_UPDATE:
+        baselines.save()
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _REPORT:
+        return
+    terminalreporter.section('LicenseVault benchmarks')
+    terminalreporter.write_line(f"{'benchmark':<24} {'items':>10} {'total':>12} {'per item':>12} {'peak alloc':>12} {'alloc/item':>12}")
+    for m in _REPORT:
+        terminalreporter.write_line(
+            f"{m.name:<24} {m.items:>10} {m.seconds * 1e3:>10.2f}ms {m.seconds_per_item * 1e6:>10.2f}us "
+            f"{m.peak_bytes / 1024:>10.0f}KB {m.bytes_per_item:>11.0f}B"
+        )
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# checkmk_jetbrains_licensevault - Jetbrains LicenseVault Agent and checks
+#
+# Copyright (C) 2025  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import datetime
+import json
+from types import SimpleNamespace
+
+import pytest  # type: ignore[import]
+from cmk_addons.plugins.jetbrains_licensevault.agent_based import licensevault
+
+CHECK_PARAMS = {
+    'denials': ('fixed', (5, 10)),
+    'regular_upper': ('used_percent', ('fixed', (0.8, 0.9))),
+    'virtual_upper': ('free', ('fixed', (5, 2))),
+    'trueup_upper': ('used', ('fixed', (40, 45))),
+}
+
+# Every value store based feature enabled
+FEATURE_PARAMS = {
+    **CHECK_PARAMS,
+    'denial_rate': {'rate_levels': ('fixed', (1.0, 5.0)), 'burst_levels': ('fixed', (0.5, 1.0))},
+    'saturation': {'threshold': 80.0, 'window': 86400, 'levels': ('fixed', (10.0, 25.0))},
+    'forecast': {'window': 64 * 3600, 'levels': ('fixed', (30 * 86400, 7 * 86400))},
+    'license_hours': {'pools': ['regular', 'virtual', 'trueup'], 'levels': ('fixed', (1000.0, 2000.0))},
+}
+
+
+def make_string_table(products, denials):
+    now = datetime.datetime.now(datetime.UTC)
+    step = datetime.timedelta(days=5) / max(denials, 1)
+    usages = [
+        {
+            'code': f"P{p}",
+            'displayName': f"Product {p}",
+            'regularInUse': p % 11,
+            'regularTotal': 10 if p % 3 == 0 else 0,
+            'trueUpInUse': p % 7,
+            'trueUpTotal': 50 if p % 3 == 1 else 0,
+            'virtualInUse': p % 5,
+            'virtualTotal': 20 if p % 3 == 2 else 0,
+        }
+        for p in range(products)
+    ]
+    records = [
+        {
+            'description': 'Unable to find suitable license',
+            'product_name': f"Product {d % products}",
+            'product_version': '2025.1',
+            'reason': 'CANCELLED',
+            'timestamp': (now - d * step).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+            'user_hostname': f"host{d % 97}.fqdn",
+            'user_ip': '10.0.0.1',
+            'username': f"user{d % 89}",
+        }
+        for d in range(denials)
+    ]
+    return [[json.dumps({'denials': records, 'licenseUsages': usages, 'timestamp': now.isoformat()})]]
+
+
+def test_parse_jetbrains_licensevault_scaling(measure, assert_linear, baselines, parse_scales):
+    results = []
+    for products, denials in parse_scales:
+        string_table = make_string_table(products, denials)
+        results.append(measure(
+            'parse', products + denials,
+            lambda: licensevault.parse_jetbrains_licensevault(string_table),
+        ))
+    assert_linear(results)
+    baselines.check(results[-1])
+
+
+def make_compact_string_table(products):
+    usage = json.loads(make_string_table(products, 0)[0][0])
+    return [['version', '2']] + [
+        [str(lic[column]) for column in licensevault.COMPACT_COLUMNS]
+        for lic in usage['licenseUsages']
+    ]
+
+
+@pytest.mark.parametrize('section_format', ['json', 'compact'])
+def test_parse_jetbrains_licensevault_usage_scaling(measure, assert_linear, baselines, product_scales, section_format):
+    results = []
+    for products in product_scales:
+        if section_format == 'json':
+            usage = json.loads(make_string_table(products, 0)[0][0])
+            del usage['denials']
+            string_table = [[json.dumps(usage)]]
+        else:
+            string_table = make_compact_string_table(products)
+        results.append(measure(
+            f"parse[{section_format}]", products,
+            lambda: licensevault.parse_jetbrains_licensevault(string_table),
+        ))
+    assert_linear(results)
+    baselines.check(results[-1])
+
+
+def test_discovery_jetbrains_licensevault_scaling(measure, assert_linear, baselines, product_scales):
+    results = []
+    for products in product_scales:
+        section = licensevault.parse_jetbrains_licensevault(make_string_table(products, products))
+        results.append(measure(
+            'discovery', products,
+            lambda: list(licensevault.discovery_jetbrains_licensevault(section, None)),
+        ))
+    assert_linear(results)
+    baselines.check(results[-1])
+
+
+@pytest.mark.parametrize('params', [{}, CHECK_PARAMS], ids=['default', 'levels'])
+def test_check_jetbrains_licensevault_scaling(measure, assert_linear, baselines, product_scales, params):
+    def check_all(section):
+        for item in section:
+            list(licensevault.check_jetbrains_licensevault(item, params, section, None))
+
+    results = []
+    for products in product_scales:
+        section = licensevault.parse_jetbrains_licensevault(make_string_table(products, products))
+        results.append(measure(
+            f"check[{'levels' if params else 'default'}]", products,
+            lambda: check_all(section),
+        ))
+    assert_linear(results)
+    baselines.check(results[-1])
+
+
+def make_denials_string_table(products, denials):
+    usage = json.loads(make_string_table(products, denials)[0][0])
+    return [[json.dumps({'timestamp': 1755500000, 'denials': usage['denials'], 'denials_truncated': False})]]
+
+
+def test_parse_jetbrains_licensevault_denials_scaling(measure, assert_linear, baselines, parse_scales):
+    results = []
+    for products, denials in parse_scales:
+        string_table = make_denials_string_table(products, denials)
+        results.append(measure(
+            'parse[denials]', denials,
+            lambda: licensevault.parse_jetbrains_licensevault_denials(string_table),
+        ))
+    assert_linear(results)
+    baselines.check(results[-1])
+
+
+class CheckCycles:
+    '''Runs the check with all features on a fake clock, one value store per item'''
+
+    def __init__(self, monkeypatch, products, denials, interval=300):
+        self.now = 1755500000.0
+        self.interval = interval
+        self.value_stores = {}
+        self.item = None
+        usage = json.loads(make_string_table(products, 0)[0][0])
+        del usage['denials']
+        self.section = licensevault.parse_jetbrains_licensevault([[json.dumps(usage)]])
+        self.denials = licensevault.parse_jetbrains_licensevault_denials(make_denials_string_table(products, denials))
+        monkeypatch.setattr(licensevault, 'time', SimpleNamespace(time=lambda: self.now))
+        monkeypatch.setattr(licensevault, 'get_value_store', lambda: self.value_stores.setdefault(self.item, {}))
+
+    def run(self, items):
+        self.now += self.interval
+        # Each cycle brings a fresh denial report
+        self.denials['timestamp'] = self.now
+        for self.item in items:
+            list(licensevault.check_jetbrains_licensevault(self.item, FEATURE_PARAMS, self.section, self.denials))
+
+
+def test_check_jetbrains_licensevault_features_scaling(measure, assert_linear, baselines, product_scales, monkeypatch):
+    results = []
+    for products in product_scales:
+        cycles = CheckCycles(monkeypatch, products, products)
+        cycles.run(cycles.section)
+        results.append(measure('check[features]', products, lambda: cycles.run(cycles.section)))
+    assert_linear(results)
+    baselines.check(results[-1])
+
+
+def test_check_jetbrains_licensevault_cycles_scaling(measure, assert_linear, baselines, cycle_scales, monkeypatch):
+    '''The value store state stays bounded, so each check cycle costs the same however many came before'''
+    def run_cycles(count):
+        cycles = CheckCycles(monkeypatch, 3, 30)
+        for _ in range(count):
+            cycles.run(cycles.section)
+
+    results = [measure('check[cycles]', count, lambda: run_cycles(count)) for count in cycle_scales]
+    assert_linear(results)
+    baselines.check(results[-1])
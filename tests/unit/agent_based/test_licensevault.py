@@ -19,8 +19,12 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
+import datetime
+import json
+
 import pytest  # type: ignore[import]
 from cmk.agent_based.v2 import (
+    render,
     Result,
     Service,
     State,
@@ -50,22 +54,24 @@ EXAMPLE_STRINGTABLE = [
         '{"code": "WS", "displayName": "WebStorm", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0}], "timestamp": "2025-08-18T10:26:37.836075076Z"}'],
 ]
 
+EXAMPLE_DENIALS = json.loads(EXAMPLE_STRINGTABLE[0][0])['denials']
+
 EXAMPLE_SECTION = {
-    "All Products Pack": {"code": "ALL", "displayName": "All Products Pack", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 3, "virtualTotal": 50, "denials": 0},
-    "CLion": {"code": "CL", "displayName": "CLion", "regularInUse": 3, "regularTotal": 10, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0},
-    "DataGrip": {"code": "DB", "displayName": "DataGrip", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 1, "trueUpTotal": 5, "virtualInUse": 0, "virtualTotal": 0, "denials": 0},
-    "DataSpell": {"code": "DS", "displayName": "DataSpell", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0},
-    "dotUltimate": {"code": "DUL", "displayName": "dotUltimate", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0},
-    "GoLand": {"code": "GO", "displayName": "GoLand", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0},
-    "IntelliJ IDEA Ultimate": {"code": "II", "displayName": "IntelliJ IDEA Ultimate", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 1},
-    "PyCharm": {"code": "PC", "displayName": "PyCharm", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0},
-    "PhpStorm": {"code": "PS", "displayName": "PhpStorm", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0},
-    "ReSharper C++": {"code": "RC", "displayName": "ReSharper C++", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0},
-    "Rider": {"code": "RD", "displayName": "Rider", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0},
-    "RubyMine": {"code": "RM", "displayName": "RubyMine", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0},
-    "RustRover": {"code": "RR", "displayName": "RustRover", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0},
-    "ReSharper": {"code": "RS0", "displayName": "ReSharper", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0},
-    "WebStorm": {"code": "WS", "displayName": "WebStorm", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0}
+    "All Products Pack": {"code": "ALL", "displayName": "All Products Pack", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 3, "virtualTotal": 50, "denials": 0, "denial_records": [], "denials_truncated": False, "denials_timestamp": None},
+    "CLion": {"code": "CL", "displayName": "CLion", "regularInUse": 3, "regularTotal": 10, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0, "denial_records": [], "denials_truncated": False, "denials_timestamp": None},
+    "DataGrip": {"code": "DB", "displayName": "DataGrip", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 1, "trueUpTotal": 5, "virtualInUse": 0, "virtualTotal": 0, "denials": 0, "denial_records": [], "denials_truncated": False, "denials_timestamp": None},
+    "DataSpell": {"code": "DS", "displayName": "DataSpell", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0, "denial_records": [], "denials_truncated": False, "denials_timestamp": None},
+    "dotUltimate": {"code": "DUL", "displayName": "dotUltimate", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0, "denial_records": [], "denials_truncated": False, "denials_timestamp": None},
+    "GoLand": {"code": "GO", "displayName": "GoLand", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0, "denial_records": [], "denials_truncated": False, "denials_timestamp": None},
+    "IntelliJ IDEA Ultimate": {"code": "II", "displayName": "IntelliJ IDEA Ultimate", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 1, "denial_records": EXAMPLE_DENIALS[1:], "denials_truncated": False, "denials_timestamp": None},
+    "PyCharm": {"code": "PC", "displayName": "PyCharm", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0, "denial_records": [], "denials_truncated": False, "denials_timestamp": None},
+    "PhpStorm": {"code": "PS", "displayName": "PhpStorm", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0, "denial_records": [], "denials_truncated": False, "denials_timestamp": None},
+    "ReSharper C++": {"code": "RC", "displayName": "ReSharper C++", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0, "denial_records": [], "denials_truncated": False, "denials_timestamp": None},
+    "Rider": {"code": "RD", "displayName": "Rider", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0, "denial_records": [], "denials_truncated": False, "denials_timestamp": None},
+    "RubyMine": {"code": "RM", "displayName": "RubyMine", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0, "denial_records": [], "denials_truncated": False, "denials_timestamp": None},
+    "RustRover": {"code": "RR", "displayName": "RustRover", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0, "denial_records": [], "denials_truncated": False, "denials_timestamp": None},
+    "ReSharper": {"code": "RS0", "displayName": "ReSharper", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0, "denial_records": [], "denials_truncated": False, "denials_timestamp": None},
+    "WebStorm": {"code": "WS", "displayName": "WebStorm", "regularInUse": 0, "regularTotal": 0, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0, "denials": 0, "denial_records": [], "denials_truncated": False, "denials_timestamp": None}
 }
 
 
@@ -84,7 +90,7 @@ def test_parse_jetbrains_licensevault(freezer, string_table, result):
     (EXAMPLE_SECTION, [Service(item='All Products Pack'), Service(item='CLion'), Service(item='DataGrip')]),
 ])
 def test_discovery_jetbrains_licensevault(section, result):
-    assert list(licensevault.discovery_jetbrains_licensevault(section)) == result
+    assert list(licensevault.discovery_jetbrains_licensevault(section, None)) == result
 
 
 @pytest.mark.parametrize('item, params, result', [
@@ -97,12 +103,16 @@ def test_discovery_jetbrains_licensevault(section, result):
         Result(state=State.OK, notice='Regular in use: 0'),
         Metric('regular_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('regular_total', 0.0),
+        Metric('regular_free', 0.0),
         Result(state=State.OK, summary='Virtual in use: 3'),
         Metric('virtual_inuse', 3.0, boundaries=(0.0, 50.0)),
         Metric('virtual_total', 50.0),
+        Metric('virtual_free', 47.0),
+        Metric('virtual_util_percent', 6.0, boundaries=(0.0, 100.0)),
         Result(state=State.OK, notice='TrueUp in use: 0'),
         Metric('trueup_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('trueup_total', 0.0),
+        Metric('trueup_free', 0.0),
     ]),
     ('CLion', {}, [
         Result(state=State.OK, notice='Denials in 24H: 0'),
@@ -110,12 +120,16 @@ def test_discovery_jetbrains_licensevault(section, result):
         Result(state=State.OK, summary='Regular in use: 3'),
         Metric('regular_inuse', 3.0, boundaries=(0.0, 10.0)),
         Metric('regular_total', 10.0),
+        Metric('regular_free', 7.0),
+        Metric('regular_util_percent', 30.0, boundaries=(0.0, 100.0)),
         Result(state=State.OK, notice='Virtual in use: 0'),
         Metric('virtual_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('virtual_total', 0.0),
+        Metric('virtual_free', 0.0),
         Result(state=State.OK, notice='TrueUp in use: 0'),
         Metric('trueup_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('trueup_total', 0.0),
+        Metric('trueup_free', 0.0),
     ]),
     ('DataGrip', {}, [
         Result(state=State.OK, notice='Denials in 24H: 0'),
@@ -123,12 +137,16 @@ def test_discovery_jetbrains_licensevault(section, result):
         Result(state=State.OK, notice='Regular in use: 0'),
         Metric('regular_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('regular_total', 0.0),
+        Metric('regular_free', 0.0),
         Result(state=State.OK, notice='Virtual in use: 0'),
         Metric('virtual_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('virtual_total', 0.0),
+        Metric('virtual_free', 0.0),
         Result(state=State.OK, summary='TrueUp in use: 1'),
         Metric('trueup_inuse', 1.0, boundaries=(0.0, 5.0)),
         Metric('trueup_total', 5.0),
+        Metric('trueup_free', 4.0),
+        Metric('trueup_util_percent', 20.0, boundaries=(0.0, 100.0)),
     ]),
     ('All Products Pack', {'virtual_upper': ('used', ('fixed', (40, 45)))}, [
         Result(state=State.OK, notice='Denials in 24H: 0'),
@@ -136,12 +154,16 @@ def test_discovery_jetbrains_licensevault(section, result):
         Result(state=State.OK, notice='Regular in use: 0'),
         Metric('regular_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('regular_total', 0.0),
+        Metric('regular_free', 0.0),
         Result(state=State.OK, summary='Virtual in use: 3'),
         Metric('virtual_inuse', 3.0, levels=(40.0, 45.0), boundaries=(0.0, 50.0)),
         Metric('virtual_total', 50.0),
+        Metric('virtual_free', 47.0),
+        Metric('virtual_util_percent', 6.0, boundaries=(0.0, 100.0)),
         Result(state=State.OK, notice='TrueUp in use: 0'),
         Metric('trueup_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('trueup_total', 0.0),
+        Metric('trueup_free', 0.0),
     ]),
     ('All Products Pack', {'virtual_upper': ('used', ('fixed', (1, 5)))}, [
         Result(state=State.OK, notice='Denials in 24H: 0'),
@@ -149,12 +171,16 @@ def test_discovery_jetbrains_licensevault(section, result):
         Result(state=State.OK, notice='Regular in use: 0'),
         Metric('regular_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('regular_total', 0.0),
+        Metric('regular_free', 0.0),
         Result(state=State.WARN, summary='Virtual in use: 3 (warn/crit at 1/5)'),
         Metric('virtual_inuse', 3.0, levels=(1.0, 5.0), boundaries=(0.0, 50.0)),
         Metric('virtual_total', 50.0),
+        Metric('virtual_free', 47.0),
+        Metric('virtual_util_percent', 6.0, boundaries=(0.0, 100.0)),
         Result(state=State.OK, notice='TrueUp in use: 0'),
         Metric('trueup_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('trueup_total', 0.0),
+        Metric('trueup_free', 0.0),
     ]),
     ('All Products Pack', {'virtual_upper': ('used', ('fixed', (1, 2)))}, [
         Result(state=State.OK, notice='Denials in 24H: 0'),
@@ -162,12 +188,16 @@ def test_discovery_jetbrains_licensevault(section, result):
         Result(state=State.OK, notice='Regular in use: 0'),
         Metric('regular_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('regular_total', 0.0),
+        Metric('regular_free', 0.0),
         Result(state=State.CRIT, summary='Virtual in use: 3 (warn/crit at 1/2)'),
         Metric('virtual_inuse', 3.0, levels=(1.0, 2.0), boundaries=(0.0, 50.0)),
         Metric('virtual_total', 50.0),
+        Metric('virtual_free', 47.0),
+        Metric('virtual_util_percent', 6.0, boundaries=(0.0, 100.0)),
         Result(state=State.OK, notice='TrueUp in use: 0'),
         Metric('trueup_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('trueup_total', 0.0),
+        Metric('trueup_free', 0.0),
     ]),
     ('All Products Pack', {'virtual_upper': ('free', ('fixed', (10, 5)))}, [
         Result(state=State.OK, notice='Denials in 24H: 0'),
@@ -175,12 +205,16 @@ def test_discovery_jetbrains_licensevault(section, result):
         Result(state=State.OK, notice='Regular in use: 0'),
         Metric('regular_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('regular_total', 0.0),
+        Metric('regular_free', 0.0),
         Result(state=State.OK, summary='Virtual in use: 3'),
         Metric('virtual_inuse', 3.0, levels=(40.0, 45.0), boundaries=(0.0, 50.0)),
         Metric('virtual_total', 50.0),
+        Metric('virtual_free', 47.0),
+        Metric('virtual_util_percent', 6.0, boundaries=(0.0, 100.0)),
         Result(state=State.OK, notice='TrueUp in use: 0'),
         Metric('trueup_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('trueup_total', 0.0),
+        Metric('trueup_free', 0.0),
     ]),
     ('All Products Pack', {'virtual_upper': ('free', ('fixed', (49, 45)))}, [
         Result(state=State.OK, notice='Denials in 24H: 0'),
@@ -188,12 +222,16 @@ def test_discovery_jetbrains_licensevault(section, result):
         Result(state=State.OK, notice='Regular in use: 0'),
         Metric('regular_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('regular_total', 0.0),
+        Metric('regular_free', 0.0),
         Result(state=State.WARN, summary='Virtual in use: 3 (warn/crit at 1/5)'),
         Metric('virtual_inuse', 3.0, levels=(1.0, 5.0), boundaries=(0.0, 50.0)),
         Metric('virtual_total', 50.0),
+        Metric('virtual_free', 47.0),
+        Metric('virtual_util_percent', 6.0, boundaries=(0.0, 100.0)),
         Result(state=State.OK, notice='TrueUp in use: 0'),
         Metric('trueup_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('trueup_total', 0.0),
+        Metric('trueup_free', 0.0),
     ]),
     ('All Products Pack', {'virtual_upper': ('free', ('fixed', (49, 48)))}, [
         Result(state=State.OK, notice='Denials in 24H: 0'),
@@ -201,12 +239,16 @@ def test_discovery_jetbrains_licensevault(section, result):
         Result(state=State.OK, notice='Regular in use: 0'),
         Metric('regular_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('regular_total', 0.0),
+        Metric('regular_free', 0.0),
         Result(state=State.CRIT, summary='Virtual in use: 3 (warn/crit at 1/2)'),
         Metric('virtual_inuse', 3.0, levels=(1.0, 2.0), boundaries=(0.0, 50.0)),
         Metric('virtual_total', 50.0),
+        Metric('virtual_free', 47.0),
+        Metric('virtual_util_percent', 6.0, boundaries=(0.0, 100.0)),
         Result(state=State.OK, notice='TrueUp in use: 0'),
         Metric('trueup_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('trueup_total', 0.0),
+        Metric('trueup_free', 0.0),
     ]),
     ('All Products Pack', {'virtual_upper': ('used_percent', ('fixed', (0.8, 0.9)))}, [
         Result(state=State.OK, notice='Denials in 24H: 0'),
@@ -214,12 +256,16 @@ def test_discovery_jetbrains_licensevault(section, result):
         Result(state=State.OK, notice='Regular in use: 0'),
         Metric('regular_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('regular_total', 0.0),
+        Metric('regular_free', 0.0),
         Result(state=State.OK, summary='Virtual in use: 3'),
         Metric('virtual_inuse', 3.0, levels=(40.0, 45.0), boundaries=(0.0, 50.0)),
         Metric('virtual_total', 50.0),
+        Metric('virtual_free', 47.0),
+        Metric('virtual_util_percent', 6.0, boundaries=(0.0, 100.0)),
         Result(state=State.OK, notice='TrueUp in use: 0'),
         Metric('trueup_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('trueup_total', 0.0),
+        Metric('trueup_free', 0.0),
     ]),
     ('All Products Pack', {'virtual_upper': ('used_percent', ('fixed', (0.02, 0.1)))}, [
         Result(state=State.OK, notice='Denials in 24H: 0'),
@@ -227,12 +273,16 @@ def test_discovery_jetbrains_licensevault(section, result):
         Result(state=State.OK, notice='Regular in use: 0'),
         Metric('regular_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('regular_total', 0.0),
+        Metric('regular_free', 0.0),
         Result(state=State.WARN, summary='Virtual in use: 3 (warn/crit at 1/5)'),
         Metric('virtual_inuse', 3.0, levels=(1.0, 5.0), boundaries=(0.0, 50.0)),
         Metric('virtual_total', 50.0),
+        Metric('virtual_free', 47.0),
+        Metric('virtual_util_percent', 6.0, boundaries=(0.0, 100.0)),
         Result(state=State.OK, notice='TrueUp in use: 0'),
         Metric('trueup_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('trueup_total', 0.0),
+        Metric('trueup_free', 0.0),
     ]),
     ('All Products Pack', {'virtual_upper': ('used_percent', ('fixed', (0.02, 0.04)))}, [
         Result(state=State.OK, notice='Denials in 24H: 0'),
@@ -240,12 +290,16 @@ def test_discovery_jetbrains_licensevault(section, result):
         Result(state=State.OK, notice='Regular in use: 0'),
         Metric('regular_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('regular_total', 0.0),
+        Metric('regular_free', 0.0),
         Result(state=State.CRIT, summary='Virtual in use: 3 (warn/crit at 1/2)'),
         Metric('virtual_inuse', 3.0, levels=(1.0, 2.0), boundaries=(0.0, 50.0)),
         Metric('virtual_total', 50.0),
+        Metric('virtual_free', 47.0),
+        Metric('virtual_util_percent', 6.0, boundaries=(0.0, 100.0)),
         Result(state=State.OK, notice='TrueUp in use: 0'),
         Metric('trueup_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('trueup_total', 0.0),
+        Metric('trueup_free', 0.0),
     ]),
     ('IntelliJ IDEA Ultimate', {}, [
         Result(state=State.CRIT, notice='Denials in 24H: 1 (warn/crit at 1/1)'),
@@ -253,12 +307,15 @@ def test_discovery_jetbrains_licensevault(section, result):
         Result(state=State.OK, notice='Regular in use: 0'),
         Metric('regular_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('regular_total', 0.0),
+        Metric('regular_free', 0.0),
         Result(state=State.OK, notice='Virtual in use: 0'),
         Metric('virtual_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('virtual_total', 0.0),
+        Metric('virtual_free', 0.0),
         Result(state=State.OK, notice='TrueUp in use: 0'),
         Metric('trueup_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('trueup_total', 0.0),
+        Metric('trueup_free', 0.0),
     ]),
     ('IntelliJ IDEA Ultimate', {'denials': ('fixed', (5, 10))}, [
         Result(state=State.OK, notice='Denials in 24H: 1'),
@@ -266,13 +323,306 @@ def test_discovery_jetbrains_licensevault(section, result):
         Result(state=State.OK, notice='Regular in use: 0'),
         Metric('regular_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('regular_total', 0.0),
+        Metric('regular_free', 0.0),
         Result(state=State.OK, notice='Virtual in use: 0'),
         Metric('virtual_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('virtual_total', 0.0),
+        Metric('virtual_free', 0.0),
         Result(state=State.OK, notice='TrueUp in use: 0'),
         Metric('trueup_inuse', 0.0, boundaries=(0.0, 0.0)),
         Metric('trueup_total', 0.0),
+        Metric('trueup_free', 0.0),
     ]),
 ])
 def test_check_jetbrains_licensevault(item, params, result):
-    assert list(licensevault.check_jetbrains_licensevault(item, params, EXAMPLE_SECTION)) == result
+    assert list(licensevault.check_jetbrains_licensevault(item, params, EXAMPLE_SECTION, None)) == result
+
+
+def test_parse_jetbrains_licensevault_truncated():
+    section = licensevault.parse_jetbrains_licensevault([[
+        '{"denials": [], "denials_truncated": true, "licenseUsages": [{"code": "CL", "displayName": "CLion", "regularInUse": 3, "regularTotal": 10, "trueUpInUse": 0, "trueUpTotal": 0, "virtualInUse": 0, "virtualTotal": 0}]}'
+    ]])
+    assert section['CLion']['denials_truncated'] is True
+
+
+def test_check_jetbrains_licensevault_truncated():
+    section = {'CLion': {**EXAMPLE_SECTION['CLion'], 'denials_truncated': True}}
+    assert list(licensevault.check_jetbrains_licensevault('CLion', {}, section, None))[:3] == [
+        Result(state=State.OK, notice='Denials in 24H: 0'),
+        Metric('denials_24h', 0.0, levels=(1.0, 1.0), boundaries=(0.0, None)),
+        Result(state=State.OK, summary='Denial report truncated, denial counts are incomplete'),
+    ]
+
+
+EXAMPLE_USAGE_SECTION = {
+    name: {key: value for key, value in lic.items() if key not in ('denials', 'denial_records', 'denials_truncated', 'denials_timestamp')}
+    for name, lic in EXAMPLE_SECTION.items()
+}
+
+EXAMPLE_DENIALS_SECTION = {
+    'truncated': False,
+    'timestamp': None,
+    'products': {
+        'SequenceDiagram Core': {'denials': 1, 'denial_records': EXAMPLE_DENIALS[:1]},
+        'IntelliJ IDEA Ultimate': {'denials': 1, 'denial_records': EXAMPLE_SECTION['IntelliJ IDEA Ultimate']['denial_records']},
+    },
+}
+
+
+def test_parse_jetbrains_licensevault_usage_only(freezer):
+    usage = json.loads(EXAMPLE_STRINGTABLE[0][0])
+    del usage['denials']
+    assert licensevault.parse_jetbrains_licensevault([[json.dumps(usage)]]) == EXAMPLE_USAGE_SECTION
+
+
+EXAMPLE_COMPACT_STRINGTABLE = [
+    ['version', '2'],
+    ['ALL', 'All Products Pack', '0', '0', '0', '0', '3', '50'],
+    ['CL', 'CLion', '3', '10', '0', '0', '0', '0'],
+    ['DB', 'DataGrip', '0', '0', '1', '5', '0', '0'],
+    ['DS', 'DataSpell', '0', '0', '0', '0', '0', '0'],
+    ['DUL', 'dotUltimate', '0', '0', '0', '0', '0', '0'],
+    ['GO', 'GoLand', '0', '0', '0', '0', '0', '0'],
+    ['II', 'IntelliJ IDEA Ultimate', '0', '0', '0', '0', '0', '0'],
+    ['PC', 'PyCharm', '0', '0', '0', '0', '0', '0'],
+    ['PS', 'PhpStorm', '0', '0', '0', '0', '0', '0'],
+    ['RC', 'ReSharper C++', '0', '0', '0', '0', '0', '0'],
+    ['RD', 'Rider', '0', '0', '0', '0', '0', '0'],
+    ['RM', 'RubyMine', '0', '0', '0', '0', '0', '0'],
+    ['RR', 'RustRover', '0', '0', '0', '0', '0', '0'],
+    ['RS0', 'ReSharper', '0', '0', '0', '0', '0', '0'],
+    ['WS', 'WebStorm', '0', '0', '0', '0', '0', '0'],
+]
+
+
+def test_parse_jetbrains_licensevault_compact():
+    assert licensevault.parse_jetbrains_licensevault(EXAMPLE_COMPACT_STRINGTABLE) == EXAMPLE_USAGE_SECTION
+    assert licensevault.parse_jetbrains_licensevault([['version', '2']]) == {}
+    assert list(licensevault.parse_jetbrains_licensevault([
+        ['version', '2'], ['XX', 'Plugin', 'A', 'B', '1', '2', '0', '0', '0', '0'],
+    ])) == ['Plugin|A|B']
+    with pytest.raises(ValueError):
+        licensevault.parse_jetbrains_licensevault([['version', '3']])
+
+
+@pytest.mark.parametrize('string_table, result', [
+    ([], None),
+    ([['{"timestamp": 1755512797, "denials": [], "denials_truncated": true}']], {'truncated': True, 'timestamp': 1755512797, 'products': {}}),
+    ([[json.dumps({'denials': EXAMPLE_DENIALS, 'denials_truncated': False})]], EXAMPLE_DENIALS_SECTION),
+])
+def test_parse_jetbrains_licensevault_denials(freezer, string_table, result):
+    freezer.move_to('2025-08-18 10:27')
+    assert licensevault.parse_jetbrains_licensevault_denials(string_table) == result
+
+
+@pytest.mark.parametrize('item, denials, result', [
+    ('IntelliJ IDEA Ultimate', None, []),
+    ('IntelliJ IDEA Ultimate', EXAMPLE_DENIALS_SECTION, [
+        Result(state=State.CRIT, notice='Denials in 24H: 1 (warn/crit at 1/1)'),
+        Metric('denials_24h', 1.0, levels=(1.0, 1.0), boundaries=(0.0, None)),
+    ]),
+    ('CLion', EXAMPLE_DENIALS_SECTION, [
+        Result(state=State.OK, notice='Denials in 24H: 0'),
+        Metric('denials_24h', 0.0, levels=(1.0, 1.0), boundaries=(0.0, None)),
+    ]),
+])
+def test_check_jetbrains_licensevault_denials_section(item, denials, result):
+    results = list(licensevault.check_jetbrains_licensevault(item, {}, EXAMPLE_USAGE_SECTION, denials))
+    assert results[:len(result)] == result
+    assert ('denials_24h' in [r.name for r in results if isinstance(r, Metric)]) == bool(result)
+
+
+def rate_denial(username, timestamp):
+    return {**EXAMPLE_DENIALS[1], 'username': username, 'timestamp': timestamp}
+
+
+def test_check_denial_rate():
+    value_store = {}
+    records = EXAMPLE_SECTION['IntelliJ IDEA Ultimate']['denial_records']
+    assert licensevault._denial_log(records) == [
+        (1755509197.836075, json.dumps(EXAMPLE_DENIALS[1], sort_keys=True)),
+        (1755422797.836075, json.dumps(EXAMPLE_DENIALS[2], sort_keys=True)),
+    ]
+    assert list(licensevault._check_denial_rate({}, records, value_store, 1755509200)) == []
+    assert value_store['denials_counter'] == 0
+
+    records = records + [
+        rate_denial('Bob', '2025-08-18T09:26:50Z'),
+        rate_denial('Bob', '2025-08-18T09:27:00Z'),
+        rate_denial('Carol', '2025-08-18T09:27:10Z'),
+    ]
+    assert list(licensevault._check_denial_rate({'rate_levels': ('fixed', (2.0, 5.0))}, records, value_store, 1755509260)) == [
+        Result(state=State.WARN, notice='Denial rate: 3.00/min (warn/crit at 2.00/min/5.00/min)'),
+        Metric('denials_rate', 3.0, levels=(2.0, 5.0), boundaries=(0.0, None)),
+        Result(state=State.OK, notice='Denial burst (15 min average): 3.00/min'),
+        Metric('denials_burst', 3.0, boundaries=(0.0, None)),
+    ]
+    assert value_store['denials_counter'] == 3
+
+    # Records that were already counted or fell out of the lookback are not counted again
+    assert list(licensevault._check_denial_rate({}, records[2:], value_store, 1755509320))[:2] == [
+        Result(state=State.OK, notice='Denial rate: 0.00/min'),
+        Metric('denials_rate', 0.0, boundaries=(0.0, None)),
+    ]
+    assert value_store['denials_counter'] == 3
+    assert len(value_store['denials_seen']) == 3
+
+
+def test_check_denial_rate_cached_report():
+    # One denial per minute, the agent refreshes the report every 15 minutes
+    # and the check runs every minute in between
+    value_store = {}
+    start = 1755500000
+    rates = []
+    for minute in range(61):
+        report_time = start + minute // 15 * 900
+        records = [
+            rate_denial(f"user{n}", datetime.datetime.fromtimestamp(start + n * 60, datetime.UTC).isoformat())
+            for n in range(0, (report_time - start) // 60 + 1)
+        ]
+        results = list(licensevault._check_denial_rate({}, records, value_store, report_time))
+        rates += [metric.value for metric in results if isinstance(metric, Metric) and metric.name == 'denials_rate']
+    assert rates == [1.0] * len(rates)
+    assert len(rates) == 61 - 15
+
+
+def test_check_denial_rate_same_second():
+    value_store = {}
+    denial = EXAMPLE_DENIALS[1]
+    list(licensevault._check_denial_rate({}, [denial], value_store, 1755509200))
+    # Same second, user, host and version, only the reason differs
+    list(licensevault._check_denial_rate({}, [denial, {**denial, 'reason': 'NO_LICENSE'}], value_store, 1755509260))
+    assert value_store['denials_counter'] == 1
+
+
+def test_check_denial_rate_old_fingerprints():
+    value_store = {'denials_seen': {'2025-08-18T09:26:37.836075076Z|Alice|host.fqdn|2024.3': 1755509197.836075}, 'denials_counter': 7}
+    records = EXAMPLE_SECTION['IntelliJ IDEA Ultimate']['denial_records']
+    list(licensevault._check_denial_rate({}, records, value_store, 1755509200))
+    assert value_store['denials_counter'] == 7
+    assert sorted(value_store['denials_seen']) == sorted(fingerprint for _, fingerprint in licensevault._denial_log(records))
+
+
+def test_update_saturation():
+    state = licensevault._update_saturation(None, 0, True, 86400)
+    state = licensevault._update_saturation(state, 1800, False, 86400)
+    assert (sum(state['sat']), sum(state['obs'])) == (1800, 1800)
+    state = licensevault._update_saturation(state, 5400, True, 86400)
+    assert (sum(state['sat']), sum(state['obs'])) == (1800, 5400)
+    # a day later the first hour has left the window
+    state = licensevault._update_saturation(state, 90000, True, 86400)
+    assert (sum(state['sat']), sum(state['obs'])) == (84600, 86400)
+    assert len(state['sat']) == licensevault.SATURATION_BUCKETS
+    # a clock gone back adds nothing, accounting goes on from the last check
+    state = licensevault._update_saturation(state, 3600, False, 86400)
+    assert (state['last'], sum(state['sat']), sum(state['obs'])) == (90000, 84600, 86400)
+    state = licensevault._update_saturation(state, 93600, False, 86400)
+    assert (sum(state['sat']), sum(state['obs'])) == (82800, 86400)
+    # back by more than the window the ring holds nothing of the present
+    state = licensevault._update_saturation(state, 0, False, 86400)
+    assert (state['last'], sum(state['sat']), sum(state['obs'])) == (0, 0, 0)
+
+
+def test_check_saturation():
+    value_store = {}
+    params = {'threshold': 30.0, 'levels': ('fixed', (10.0, 25.0))}
+    list(licensevault._check_saturation(params, EXAMPLE_SECTION['CLion'], value_store, 1755509200))
+    assert list(licensevault._check_saturation(params, EXAMPLE_SECTION['CLion'], value_store, 1755509800)) == [
+        Result(state=State.CRIT, notice='Regular saturated: 100.00% (warn/crit at 10.00%/25.00%)'),
+        Metric('regular_saturated_percent', 100.0, levels=(10.0, 25.0), boundaries=(0.0, 100.0)),
+        Result(state=State.OK, notice=f"Regular saturated for {render.timespan(600)} in the last {render.timespan(604800)}"),
+        Metric('regular_saturated_seconds', 600.0),
+    ]
+    assert list(value_store) == ['saturation_regular']
+
+
+def test_update_forecast():
+    state = None
+    for n in range(licensevault.FORECAST_SAMPLES * 4 + 10):
+        state = licensevault._update_forecast(state, n * 1800, n / 2, 64 * 3600)
+    # one sample per hour, the ring holds the last 64
+    assert len(state['samples']) == licensevault.FORECAST_SAMPLES
+    assert min(t for t, _ in state['samples']) == state['last'] - 63 * 3600
+    assert licensevault._time_to_exhaustion(state, 200 * 3600, 300) == pytest.approx(100 * 3600)
+    # a clock gone back adds no sample
+    last, samples = state['last'], list(state['samples'])
+    state = licensevault._update_forecast(state, last - 7200, 0, 64 * 3600)
+    assert (state['last'], state['samples']) == (last, samples)
+    state = licensevault._update_forecast(state, last - 65 * 3600, 0, 64 * 3600)
+    assert state['samples'] == [(last - 65 * 3600, 0)]
+
+
+def test_check_forecast():
+    value_store = {}
+    lic = dict(EXAMPLE_SECTION['CLion'])
+    params = {'window': 64 * 3600, 'levels': ('fixed', (30 * 86400, 7 * 86400))}
+    for n in range(2):
+        lic['regularInUse'] = n + 1
+        assert list(licensevault._check_forecast(params, lic, value_store, n * 3600)) == [
+            Result(state=State.OK, notice='Regular exhaustion: not expected'),
+        ]
+    lic['regularInUse'] = 3
+    assert list(licensevault._check_forecast(params, lic, value_store, 2 * 3600)) == [
+        Result(state=State.CRIT, notice=f"Regular exhaustion in: {render.timespan(7 * 3600)} (warn/crit below {render.timespan(30 * 86400)}/{render.timespan(7 * 86400)})"),
+        Metric('regular_time_to_exhaustion', 7 * 3600, boundaries=(0.0, None)),
+    ]
+    assert list(value_store) == ['forecast_regular']
+
+
+def test_billing_period():
+    now = datetime.datetime(2025, 8, 18, 12).timestamp()
+    assert licensevault._billing_period(now, 'month', 1) == (
+        datetime.datetime(2025, 8, 1).timestamp(),
+        datetime.datetime(2025, 9, 1).timestamp(),
+    )
+    assert licensevault._billing_period(now, 'month', 20) == (
+        datetime.datetime(2025, 7, 20).timestamp(),
+        datetime.datetime(2025, 8, 20).timestamp(),
+    )
+    assert licensevault._billing_period(now, 'quarter', 1) == (
+        datetime.datetime(2025, 7, 1).timestamp(),
+        datetime.datetime(2025, 10, 1).timestamp(),
+    )
+    assert licensevault._billing_period(now, 'year', 1) == (
+        datetime.datetime(2025, 1, 1).timestamp(),
+        datetime.datetime(2026, 1, 1).timestamp(),
+    )
+    # before the reset day the period started in the previous year
+    now = datetime.datetime(2025, 1, 10).timestamp()
+    assert licensevault._billing_period(now, 'month', 15) == (
+        datetime.datetime(2024, 12, 15).timestamp(),
+        datetime.datetime(2025, 1, 15).timestamp(),
+    )
+
+
+def test_update_license_hours():
+    state = licensevault._update_license_hours(None, 0, 2, 0)
+    state = licensevault._update_license_hours(state, 3600, 4, 0)
+    assert state['hours'] == 3.0
+    state = licensevault._update_license_hours(state, 7200, 4, 0)
+    assert state['hours'] == 7.0
+    # a new period only keeps the usage since the reset
+    state = licensevault._update_license_hours(state, 10800, 6, 9000)
+    assert (state['period_start'], state['hours']) == (9000, 2.0)
+    # a clock gone back adds nothing and integrates on from the new time
+    state = licensevault._update_license_hours(state, 9900, 2, 9000)
+    assert (state['last'], state['in_use'], state['hours']) == (9900, 2, 2.0)
+    state = licensevault._update_license_hours(state, 13500, 2, 9000)
+    assert state['hours'] == 4.0
+    state = licensevault._update_license_hours(state, 8000, 2, 0)
+    assert (state['period_start'], state['hours']) == (0, 0.0)
+
+
+def test_check_license_hours():
+    value_store = {}
+    lic = dict(EXAMPLE_SECTION['CLion'], trueUpInUse=2)
+    params = {'period': 'month', 'levels': ('fixed', (1000.0, 1500.0))}
+    start, end = licensevault._billing_period(datetime.datetime(2025, 8, 18).timestamp(), 'month', 1)
+    list(licensevault._check_license_hours(params, lic, value_store, start))
+    assert list(licensevault._check_license_hours(params, lic, value_store, start + 36000)) == [
+        Result(state=State.OK, notice='TrueUp license hours this period: 20.0 h'),
+        Metric('trueup_license_hours', 20.0, boundaries=(0.0, None)),
+        Result(state=State.WARN, notice='TrueUp license hours projected: 1488.0 h (warn/crit at 1000.0 h/1500.0 h)'),
+        Metric('trueup_license_hours_projected', 1488.0, levels=(1000.0, 1500.0), boundaries=(0.0, None)),
+    ]
+    assert list(value_store) == ['license_hours_trueup']
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+#
+# checkmk_jetbrains_licensevault - Jetbrains LicenseVault Agent and checks
+#
+# Copyright (C) 2025  Marius Rieder <marius.rieder@scs.ch>
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import json
+import socket
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import parse_qs, urlsplit
+
+import pytest  # type: ignore[import]
+from cmk.special_agents.v0_unstable.agent_common import CannotRecover
+from cmk.utils.paths import tmp_dir, var_dir
+from cmk_addons.plugins.jetbrains_licensevault.lib.agent import AgentLicenseVault, Deadline, denial_event, EventConsole, LVAPI
+
+URL = 'https://example.lv.jetbrains-ide-services.com'
+
+
+def denial(n):
+    return {'product_name': 'CLion', 'timestamp': f"2025-08-18T08:{n // 60:02d}:{n % 60:02d}Z", 'username': f"user{n}"}
+
+
+@pytest.fixture
+def api():
+    return LVAPI(URL, 'secret', timeout=10)
+
+
+def test_denials(api, requests_mock):
+    requests_mock.get(f"{URL}/public-api/denials/report", [
+        {'json': [denial(n) for n in range(100)]},
+        {'json': [denial(n) for n in range(100, 120)]},
+    ])
+    denials, truncated = api.denials(days=5)
+    assert len(denials) == 120
+    assert truncated is False
+    assert [r.qs['offset'] for r in requests_mock.request_history] == [['0'], ['100']]
+
+
+class Report:
+    '''Denial report ordered by timestamp, inserting late records after the first page'''
+
+    def __init__(self, records, late=(), reverse=False, ignore_from=False):
+        self.records = records
+        self.late = list(late)
+        self.reverse = reverse
+        self.ignore_from = ignore_from
+
+    def __call__(self, request, context):
+        query = parse_qs(urlsplit(request.url).query)
+        start = datetime.fromisoformat(query['from'][0])
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=timezone.utc)
+        offset, limit = int(query['offset'][0]), int(query['limit'][0])
+        matching = [r for r in self.records if self.ignore_from or datetime.fromisoformat(r['timestamp']) >= start]
+        if self.reverse:
+            matching.reverse()
+        if self.late:
+            self.records = sorted(self.records + self.late, key=lambda r: r['timestamp'])
+            self.late = []
+        return matching[offset:offset + limit]
+
+
+def stamped(n, seconds):
+    return {**denial(n), 'timestamp': (datetime.now(timezone.utc) - timedelta(hours=1) + timedelta(seconds=seconds)).strftime('%Y-%m-%dT%H:%M:%SZ')}
+
+
+@pytest.mark.parametrize('pagination, duplicates', [
+    ('offset', 1),
+    ('keyset', 0),
+])
+def test_denials_late_record(api, requests_mock, pagination, duplicates):
+    requests_mock.get(f"{URL}/public-api/denials/report", json=Report(
+        [stamped(n, n) for n in range(150)],
+        late=[stamped(1000, 50)],
+    ))
+    denials, truncated = api.denials(days=1, pagination=pagination)
+    ids = [d['username'] for d in denials]
+    assert len(ids) - len(set(ids)) == duplicates
+    assert {f"user{n}" for n in range(150)} <= set(ids)
+
+
+def test_denials_keyset_same_timestamp(api, requests_mock):
+    requests_mock.get(f"{URL}/public-api/denials/report", json=Report([stamped(n, 0) for n in range(250)]))
+    denials, truncated = api.denials(days=1, pagination='keyset')
+    assert sorted(d['username'] for d in denials) == sorted(f"user{n}" for n in range(250))
+    assert truncated is False
+
+
+def test_denials_keyset_same_second(api, requests_mock):
+    records = [stamped(n, n) for n in range(99)] + [{**stamped(99, 99), 'reason': reason} for reason in ('CANCELLED', 'NO_LICENSE')]
+    requests_mock.get(f"{URL}/public-api/denials/report", json=Report(records))
+    denials, truncated = api.denials(days=1, pagination='keyset')
+    assert denials == records
+
+
+@pytest.mark.parametrize('report', [
+    {'reverse': True},
+    {'ignore_from': True},
+])
+def test_denials_keyset_unordered(api, requests_mock, caplog, report):
+    records = [stamped(n, n) for n in range(250)]
+    requests_mock.get(f"{URL}/public-api/denials/report", json=Report(records, **report))
+    denials, truncated = api.denials(days=1, pagination='keyset', deadline=Deadline(5))
+    assert sorted(d['username'] for d in denials) == sorted(r['username'] for r in records)
+    assert truncated is False
+    assert 'falling back to offset paging' in caplog.text
+    assert requests_mock.call_count < 10
+
+
+def test_denials_error(api, requests_mock):
+    requests_mock.get(f"{URL}/public-api/denials/report", status_code=500)
+    with pytest.raises(CannotRecover):
+        api.denials(days=5)
+
+
+def test_denials_deadline_expired(api, requests_mock):
+    requests_mock.get(f"{URL}/public-api/denials/report", json=[])
+    assert api.denials(days=5, deadline=Deadline(0)) == ([], True)
+    assert requests_mock.call_count == 0
+
+
+def test_denials_deadline_truncated(api, requests_mock):
+    requests_mock.get(f"{URL}/public-api/denials/report", [
+        {'json': [denial(n) for n in range(100)]},
+        {'status_code': 500},
+    ])
+    denials, truncated = api.denials(days=5, deadline=Deadline(30))
+    assert len(denials) == 100
+    assert truncated is True
+
+
+def test_request_deadline_expired(api, requests_mock):
+    requests_mock.get(f"{URL}/public-api/licenses/usage", json={'licenseUsages': []})
+    with pytest.raises(CannotRecover, match='Out of time'):
+        api.request('GET', 'public-api/licenses/usage', deadline=Deadline(0))
+    assert requests_mock.call_count == 0
+
+
+def test_deadline_phase():
+    deadline = Deadline(30)
+    assert 19 < deadline.phase(20).remaining() <= 20
+    assert 27 < deadline.phase(reserve=2).remaining() <= 28
+    assert 27 < deadline.phase(40, reserve=2).remaining() <= 28
+    assert deadline.phase(reserve=40).expired()
+    assert deadline.timeout(10) == 10
+
+
+def test_main_denials_cached(tmp_path, requests_mock, capsys):
+    requests_mock.get(f"{URL}/public-api/licenses/usage", json={'licenseUsages': []})
+    denials = requests_mock.get(f"{URL}/public-api/denials/report", json=[denial(1)])
+    argv = ['-U', URL, '-k', 'secret', '--cache-dir', str(tmp_path), '--denials-interval', '900']
+
+    AgentLicenseVault().run(argv)
+    first = capsys.readouterr().out.splitlines()
+    AgentLicenseVault().run(argv)
+    second = capsys.readouterr().out.splitlines()
+
+    assert denials.call_count == 1
+    assert first == second
+    assert first[0] == '<<<jetbrains_licensevault:sep(124)>>>'
+    assert first[3].startswith('<<<jetbrains_licensevault_denials:cached(')
+    assert first[3].endswith(',900):sep(124)>>>')
+    report = json.loads(first[4])
+    assert first[3] == f"<<<jetbrains_licensevault_denials:cached({report['timestamp']},900):sep(124)>>>"
+    assert report['denials'] == [{'product_name': 'CLion', 'timestamp': '2025-08-18T08:00:01Z', 'username': 'user1'}]
+    assert report['denials_truncated'] is False
+
+
+def test_main_denials_uncached(tmp_path, requests_mock, capsys):
+    requests_mock.get(f"{URL}/public-api/licenses/usage", json={'licenseUsages': []})
+    denials = requests_mock.get(f"{URL}/public-api/denials/report", json=[])
+    argv = ['-U', URL, '-k', 'secret', '--cache-dir', str(tmp_path), '--denials-interval', '0']
+
+    AgentLicenseVault().run(argv)
+    AgentLicenseVault().run(argv)
+
+    assert denials.call_count == 2
+    assert '<<<jetbrains_licensevault_denials:sep(124)>>>' in capsys.readouterr().out
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_main_denials_refresh_failed(tmp_path, requests_mock, capsys):
+    requests_mock.get(f"{URL}/public-api/licenses/usage", json={'licenseUsages': []})
+    requests_mock.get(f"{URL}/public-api/denials/report", [{'json': [denial(1)]}, {'status_code': 500}])
+    argv = ['-U', URL, '-k', 'secret', '--cache-dir', str(tmp_path), '--denials-interval', '900']
+
+    AgentLicenseVault().run(argv)
+    capsys.readouterr()
+    # Let the cached report expire
+    cache = next(tmp_path.glob('*.denials.json'))
+    report = json.loads(cache.read_text())
+    report['timestamp'] -= 1000
+    cache.write_text(json.dumps(report))
+
+    AgentLicenseVault().run(argv)
+    second = capsys.readouterr().out.splitlines()
+
+    assert requests_mock.call_count == 4
+    assert second[3] == f"<<<jetbrains_licensevault_denials:cached({report['timestamp']},900):sep(124)>>>"
+    assert json.loads(second[4]) == report
+    assert report['denials'] == [denial(1)]
+
+
+def test_main_denials_days(tmp_path, requests_mock, capsys):
+    requests_mock.get(f"{URL}/public-api/licenses/usage", json={'licenseUsages': []})
+    denials = requests_mock.get(f"{URL}/public-api/denials/report", json=[])
+    AgentLicenseVault().run(['-U', URL, '-k', 'secret', '--cache-dir', str(tmp_path), '--denials-days', '1'])
+    assert denials.last_request.qs['from'] == [(date.today() - timedelta(1)).isoformat()]
+
+
+def test_main_compact(tmp_path, requests_mock, capsys):
+    requests_mock.get(f"{URL}/public-api/licenses/usage", json={'licenseUsages': [
+        {'code': 'CL', 'displayName': 'CLion', 'regularInUse': 3, 'regularTotal': 10, 'trueUpInUse': 0, 'trueUpTotal': 0, 'virtualInUse': 0, 'virtualTotal': 0},
+        {'code': 'XX', 'displayName': 'Plugin|A', 'regularInUse': 1, 'regularTotal': 2, 'trueUpInUse': 0, 'trueUpTotal': 0, 'virtualInUse': 0, 'virtualTotal': 0},
+    ], 'timestamp': '2025-08-18T10:26:37.836075076Z'})
+    requests_mock.get(f"{URL}/public-api/denials/report", json=[])
+
+    AgentLicenseVault().run(['-U', URL, '-k', 'secret', '--cache-dir', str(tmp_path), '--section-format', 'compact'])
+
+    assert capsys.readouterr().out.splitlines()[:5] == [
+        '<<<jetbrains_licensevault:sep(124)>>>',
+        'version|2',
+        'CL|CLion|3|10|0|0|0|0',
+        'XX|Plugin|A|1|2|0|0|0|0',
+        '<<<>>>',
+    ]
+
+
+def test_denial_event():
+    assert denial_event({
+        'description': 'Unable to find suitable license', 'product_name': 'IntelliJ IDEA Ultimate', 'product_version': '2024.3',
+        'reason': 'CANCELLED', 'timestamp': '2025-08-18T09:26:37.836075076Z', 'user_hostname': 'host.fqdn', 'user_ip': '1.2.3.4', 'username': 'Alice "A"',
+    }, 'lv.example.com') == (
+        '<132>1 2025-08-18T09:26:37.836075+00:00 lv.example.com licensevault - denial '
+        '[licensevault@32473 product="IntelliJ IDEA Ultimate" user="Alice \\"A\\"" host="host.fqdn" version="2024.3" reason="CANCELLED"] '
+        'License denied for IntelliJ IDEA Ultimate 2024.3 to Alice "A"@host.fqdn: CANCELLED'
+    )
+
+
+def test_main_event_console(tmp_path, requests_mock, capsys):
+    event_console = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    event_console.bind(str(tmp_path / 'eventsocket'))
+    event_console.listen()
+    event_console.settimeout(0)
+
+    def received():
+        try:
+            conn, _ = event_console.accept()
+        except BlockingIOError:
+            return []
+        with conn:
+            conn.settimeout(1)
+            return b''.join(iter(lambda: conn.recv(4096), b'')).decode('utf-8').splitlines()
+
+    requests_mock.get(f"{URL}/public-api/licenses/usage", json={'licenseUsages': []})
+    requests_mock.get(f"{URL}/public-api/denials/report", json=[denial(1), denial(2)])
+    argv = [
+        '-U', URL, '-k', 'secret', '--cache-dir', str(tmp_path), '--denials-interval', '0',
+        '--event-console', f"unix:{tmp_path / 'eventsocket'}", '--event-host', 'lv',
+    ]
+
+    # The first run only places the cursor
+    AgentLicenseVault().run(argv)
+    assert received() == []
+
+    requests_mock.get(f"{URL}/public-api/denials/report", json=[denial(3), denial(1), denial(2), {**denial(2), 'username': 'late'}])
+    AgentLicenseVault().run(argv)
+    assert [line.split('] ', 1)[1] for line in received()] == [
+        'License denied for CLion None to late@None: None',
+        'License denied for CLion None to user3@None: None',
+    ]
+
+    AgentLicenseVault().run(argv)
+    assert received() == []
+    capsys.readouterr()
+
+
+def test_event_console_deadline(tmp_path):
+    event_console = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    event_console.bind(str(tmp_path / 'eventsocket'))
+    event_console.listen()
+
+    with EventConsole(f"unix:{tmp_path / 'eventsocket'}", Deadline(5))._connect() as sock:
+        assert 0 < sock.gettimeout() <= 5
+    with pytest.raises(TimeoutError):
+        EventConsole('tcp:192.0.2.1:6558', Deadline(0)).send(['message'])
+
+
+def test_forward_denials_deadline_expired(tmp_path, caplog):
+    agent = AgentLicenseVault()
+    agent.args = agent.parse_arguments([
+        '-U', URL, '-k', 'secret', '--cache-dir', str(tmp_path), '--event-console', 'tcp:192.0.2.1:6558',
+    ])
+    agent.forward_denials(report(denial(1)), Deadline(5), NOW)
+    cursor = agent.load_cache('events')
+
+    agent.forward_denials(report(denial(1), denial(2)), Deadline(0), NOW)
+    assert agent.load_cache('events') == cursor
+    assert 'Out of time' in caplog.text
+
+
+def report(*denials, truncated=False):
+    return {'timestamp': int(NOW), 'denials': list(denials), 'denials_truncated': truncated}
+
+
+NOW = datetime(2025, 8, 18, 9, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.mark.parametrize('first', [
+    report(truncated=True),
+    report(denial(1), truncated=True),
+    report(),
+    {'timestamp': None, 'ids': []},
+])
+def test_forward_denials_cursor_start(tmp_path, monkeypatch, first):
+    agent = AgentLicenseVault()
+    agent.args = agent.parse_arguments([
+        '-U', URL, '-k', 'secret', '--cache-dir', str(tmp_path), '--event-console', 'tcp:192.0.2.1:6558',
+    ])
+    sent = []
+    monkeypatch.setattr(EventConsole, 'send', lambda self, messages: sent.extend(messages))
+    if 'denials' in first:
+        agent.forward_denials(first, Deadline(5), NOW)
+    else:
+        # Cursor stored from an empty report by an older version
+        agent.store_cache('events', first)
+
+    # History from before the first complete report is never forwarded
+    agent.forward_denials(report(denial(1), denial(2)), Deadline(5), NOW + 60)
+    assert sent == []
+    later = {**denial(3), 'timestamp': '2025-08-18T09:01:00Z'}
+    agent.forward_denials(report(denial(1), denial(2), later), Deadline(5), NOW + 120)
+    assert len(sent) == 1 and 'user3' in sent[0]
+
+
+def test_cache_file_default(monkeypatch):
+    agent = AgentLicenseVault()
+    agent.args = agent.parse_arguments(['-U', URL, '-k', 'secret'])
+    assert agent.cache_file('denials') == tmp_dir / 'agents' / 'agent_jetbrains_licensevault' / 'example.lv.jetbrains-ide-services.com.denials.json'
+    assert agent.cache_file('events') == var_dir / 'agents' / 'agent_jetbrains_licensevault' / 'example.lv.jetbrains-ide-services.com.events.json'